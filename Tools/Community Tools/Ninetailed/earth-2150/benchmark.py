@@ -0,0 +1,273 @@
+#!/usr/bin/env python3
+from itertools import count
+from struct import pack
+
+import argparse
+import importlib.util
+import os
+import os.path
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+from e2150 import par2csv, parschema, wdfile
+
+
+usage = '''benchmark.py [options]
+Generates synthetic WD, TEX and PAR files and times the tools in this directory against them, so no game data is needed.\
+'''
+
+here = os.path.dirname(os.path.abspath(__file__))
+
+
+# Fixture generators
+
+def make_member(rng, size, ratio):
+    """Bytes of the given size that zlib compresses to roughly ratio of their length."""
+    random_part = int(size * ratio)
+    return rng.randbytes(random_part) + bytes(size - random_part)
+
+def make_wd(path, members=500, size=64 * 1024, ratio=0.5, seed=0):
+    rng = random.Random(seed)
+    total = 0
+    with wdfile.WdWriter(path) as writer:
+        for i in range(members):
+            member_size = rng.randint(size // 2, size * 3 // 2)
+            total += member_size
+            writer.add(f'Bench\\Dir{i % 16}\\file{i}.dat', make_member(rng, member_size, ratio))
+    return total
+
+TEX_MAGIC = b'TEX\x00\x01\x00\x00\x00'
+
+def tex_image(rng, w, h, mipmapped):
+    if mipmapped:
+        levels = w.bit_length()
+        data = [pack('<III', w, h, levels)]
+        for _ in range(levels):
+            data.append(rng.randbytes(w * h * 4))
+            w >>= 1
+            h >>= 1
+    else:
+        data = [pack('<II', w, h), rng.randbytes(w * h * 4)]
+    return b''.join(data)
+
+def make_tex(path, size=256, mipmapped=True, textures=1, frames=None, seed=0):
+    """Write a TEX file: a single texture, or an atlas of textures (times frames for an 0xc0 animated set)."""
+    rng = random.Random(seed)
+    flags = b'\x06\x00\x00\x00' if mipmapped else b'\x00\x00\x00\x00'
+    with open(path, 'wb') as f:
+        if textures == 1 and frames is None:
+            f.write(TEX_MAGIC + flags + b'\x88\x88\x00\x00' + tex_image(rng, size, size, mipmapped))
+            return
+        f.write(TEX_MAGIC + (b'\x00\x00\x00\xc0' if frames else b'\x00\x00\x00\x00') + pack('<I', textures))
+        if frames:
+            f.write(pack('<I', frames))
+        for _ in range(textures * (frames or 1)):
+            f.write(TEX_MAGIC + flags + b'\x88\x88\x00\x00' + tex_image(rng, size, size, mipmapped))
+
+# The CSV files whose layouts the synthetic PAR uses
+par_tables = {'vehicle', 'building', 'cannon', 'missile', 'soundpack', 'repairer', 'passive', 'explosion', 'shieldgenerator'}
+
+def par_group(schema):
+    """(entity type, class ID, field count, string fields, reference fields) of a group laid out as schema says."""
+    strings = {i for (i, column) in enumerate(schema.columns) if column.kind == parschema.STRING}
+    return schema.entity_type.value, schema.class_id and schema.class_id.value, len(schema.columns), strings, set(schema.ref_fields)
+
+# Taken from the same schemas csv2par encodes with, in the order csv2par writes them so a round trip reproduces the file
+par_groups = [par_group(schema) for (name, schema) in parschema.schemas.items() if name in par_tables]
+
+def par_string(value):
+    data = value.encode('latin_1')
+    return pack('<I', len(data)) + data
+
+def make_par(path, entities_per_group=100, research=300, seed=0):
+    """Write a PAR file in the layout par2csv reads. Returns the entity count."""
+    rng = random.Random(seed)
+    out = [b'PAR\x00\x99\x00\x00\x00', pack('<II', len(par_groups) * 3, 0)]
+    names = count()
+    total = 0
+    entity_count = len(par_groups) * 3 * entities_per_group
+    for (entity_type, class_id, field_count, strings, refs) in par_groups:
+        for faction in (1, 2, 3):
+            out.append(pack('<III', faction, entity_type, entities_per_group))
+            for _ in range(entities_per_group):
+                total += 1
+                out.append(par_string(f'ENTITY_{next(names)}'))
+                req = rng.sample(range(research), rng.randint(0, 2))
+                out.append(pack(f'<I{len(req)}I', len(req), *req))
+                types = bytearray()
+                values = []
+                for i in range(field_count):
+                    if i in refs:
+                        types += b'\x01\x00'
+                        values.append(par_string(f'ENTITY_{rng.randrange(entity_count)}') + b'\xff\xff\xff\xff')
+                    elif i in strings:
+                        types += b'\x01'
+                        values.append(par_string(f'MESH_{rng.randrange(1000)}'))
+                    elif i == 0 and class_id is not None:
+                        types += b'\x00'
+                        values.append(pack('<I', class_id))
+                    else:
+                        types += b'\x00'
+                        values.append(pack('<I', rng.randrange(100000)))
+                out.append(pack('<I', len(types)) + bytes(types))
+                out.extend(values)
+    out.append(pack('<I', research))
+    for i in range(research):
+        previous = rng.sample(range(i), min(i, rng.randint(0, 2)))
+        out.append(pack(f'<I{len(previous)}I', len(previous), *previous))
+        out.append(pack('<IIIIII', i, 1 + i % 3, *(rng.randrange(10000) for _ in range(4))))
+        out.append(par_string(f'RES_{i}') + par_string(f'video{i}') + pack('<I', i % 4) + par_string(f'mesh{i}') + pack('<I', 0))
+    out.append(pack('<II', 1, research - 1))
+    with open(path, 'wb') as f:
+        f.write(b''.join(out))
+    return total
+
+
+# Measurement
+
+class Result:
+    def __init__(self, name, seconds, peak, volume=None, items=None, unit='items'):
+        self.name = name
+        self.seconds = seconds
+        self.peak = peak
+        self.volume = volume
+        self.items = items
+        self.unit = unit
+
+    def __str__(self):
+        line = f'{self.name:<28} {self.seconds * 1000:>10.1f} ms'
+        line += f' {self.volume / self.seconds / 2**20:>10.1f} MB/s' if self.volume else ' ' * 16
+        line += f' {self.items / self.seconds:>12.0f} {self.unit}/s' if self.items else ' ' * (22 + len(self.unit))
+        if self.peak is not None:
+            line += f'  peak {self.peak / 2**20:.1f} MB'
+        return line
+
+def measure(fn, repeat):
+    """Best time of repeat calls, plus peak Python heap use during one of them."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return best, peak
+
+# Runs a tool module as __main__, then reports the process's peak RSS on stderr. VmHWM is used on
+# Linux because ru_maxrss there carries over the benchmark process's own peak into its children.
+script_runner = '''
+import resource, runpy, sys
+module = sys.argv[1]
+sys.argv = sys.argv[1:]
+try:
+    runpy.run_module(module, run_name='__main__', alter_sys=True)
+finally:
+    try:
+        with open('/proc/self/status') as status:
+            peak = next(int(line.split()[1]) * 1024 for line in status if line.startswith('VmHWM:'))
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+    print('peak', peak, file=sys.stderr)
+'''
+
+def measure_script(module, args, cwd, repeat):
+    """Best wall time of running one of the tool modules, plus its peak RSS where the OS reports it."""
+    best = float('inf')
+    peak = None
+    env = dict(os.environ, PYTHONPATH=os.pathsep.join(filter(None, [here, os.environ.get('PYTHONPATH')])))
+    for _ in range(repeat):
+        start = time.perf_counter()
+        if os.name == 'posix':
+            proc = subprocess.run([sys.executable, '-c', script_runner, module] + args, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        else:
+            proc = subprocess.run([sys.executable, '-m', module] + args, cwd=cwd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+        best = min(best, time.perf_counter() - start)
+        if proc.returncode:
+            raise RuntimeError(f'{module} failed with exit status {proc.returncode}:\n{proc.stderr}')
+        lines = proc.stderr.splitlines()
+        if lines and lines[-1].startswith('peak '):
+            peak = int(lines[-1].split()[1])
+    return best, peak
+
+
+def bench_wd(tmp, args):
+    archive = os.path.join(tmp, 'bench.wd')
+    volume = make_wd(archive, args.wd_members, args.wd_size, args.wd_ratio)
+    outdir = os.path.join(tmp, 'wd-out')
+    seconds, peak = measure(lambda: wdfile.readindex(archive), args.repeat)
+    yield Result('wd readindex', seconds, peak, items=args.wd_members, unit='entries')
+    seconds, peak = measure(lambda: wdfile.extractall([archive], outdir, workers=1), args.repeat)
+    yield Result('wd extract (1 thread)', seconds, peak, volume, args.wd_members, 'files')
+    seconds, peak = measure(lambda: wdfile.extractall([archive], outdir, workers=args.jobs), args.repeat)
+    yield Result('wd extract (pool)', seconds, peak, volume, args.wd_members, 'files')
+
+def bench_tex(tmp, args):
+    missing = [name for (name, module) in [('NumPy', 'numpy'), ('Pillow', 'PIL')] if importlib.util.find_spec(module) is None]
+    if missing:
+        print(f'Skipping TEX benchmarks: {" and ".join(missing)} not installed')
+        return
+    texdir = os.path.join(tmp, 'tex')
+    os.makedirs(texdir)
+    for i in range(args.tex_count):
+        if i % 4 == 3:
+            make_tex(os.path.join(texdir, f'atlas{i}.tex'), args.tex_size // 4, textures=4, frames=2, seed=i)
+        else:
+            make_tex(os.path.join(texdir, f'tex{i}.tex'), args.tex_size, mipmapped=i % 2 == 0, seed=i)
+    volume = sum(entry.stat().st_size for entry in os.scandir(texdir))
+    seconds, peak = measure_script('e2150.tex2png', ['--force'], texdir, args.repeat)
+    yield Result('tex2png', seconds, peak, volume, args.tex_count, 'textures')
+
+def bench_par(tmp, args):
+    pardir = os.path.join(tmp, 'par')
+    os.makedirs(pardir)
+    parfile = os.path.join(pardir, 'EARTH2150.par')
+    entities = make_par(parfile, args.par_entities)
+    volume = os.path.getsize(parfile)
+    seconds, peak = measure(lambda: par2csv.read_par(parfile), args.repeat)
+    yield Result('par parse', seconds, peak, volume, entities, 'entities')
+    seconds, peak = measure_script('e2150.par2csv', [parfile], pardir, args.repeat)
+    yield Result('par2csv', seconds, peak, volume, entities, 'entities')
+    seconds, peak = measure_script('e2150.csv2par', [], pardir, args.repeat)
+    yield Result('csv2par', seconds, peak, volume, entities, 'entities')
+
+
+benchmarks = {
+    'wd': bench_wd,
+    'tex': bench_tex,
+    'par': bench_par,
+}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(usage=usage)
+    parser.add_argument('only', nargs='*', metavar='benchmark', help=f'benchmarks to run: {", ".join(benchmarks)} (default: all)')
+    parser.add_argument('-r', '--repeat', type=int, default=3, help='runs per benchmark; the best time is reported')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='worker count for the parallel benchmarks')
+    parser.add_argument('--wd-members', type=int, default=500)
+    parser.add_argument('--wd-size', type=int, default=64 * 1024, help='average member size in bytes')
+    parser.add_argument('--wd-ratio', type=float, default=0.5, help='fraction of each member that is incompressible')
+    parser.add_argument('--tex-count', type=int, default=40)
+    parser.add_argument('--tex-size', type=int, default=256)
+    parser.add_argument('--par-entities', type=int, default=100, help='entities per group')
+    parser.add_argument('--keep', action='store_true', help='keep the generated files and print where they are')
+    args = parser.parse_args()
+    unknown = [name for name in args.only if name not in benchmarks]
+    if unknown:
+        parser.error(f'unknown benchmark {", ".join(unknown)} (choose from {", ".join(benchmarks)})')
+
+    tmp = tempfile.mkdtemp(prefix='e2150-bench-')
+    try:
+        for name in args.only or benchmarks:
+            for result in benchmarks[name](tmp, args):
+                print(result)
+    finally:
+        if args.keep:
+            print(f'Fixtures left in {tmp}')
+        else:
+            shutil.rmtree(tmp)
@@ -0,0 +1,7 @@
+"""Tools for Earth 2150 game data: WD archives, TEX textures and PAR parameter files.
+
+Each tool is a module of its own (wdfile, tex2png, png2tex, par2csv, csv2par
+and so on) that can be imported without side effects and whose main(argv)
+runs it as a command. Nothing is imported here, so that `python -m e2150`
+only loads the modules the chosen subcommand needs.
+"""
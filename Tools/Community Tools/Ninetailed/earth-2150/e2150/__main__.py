@@ -0,0 +1,45 @@
+import argparse
+import importlib
+import sys
+
+
+# group -> command -> (module, arguments put before the user's, help)
+commands = {
+    'wd': {
+        'list': ('wdfile', ['--list'], 'list the contents of WD archives'),
+        'extract': ('wdfile', [], 'extract the contents of WD archives'),
+    },
+    'tex': {
+        'convert': ('tex2png', [], 'convert TEX files to PNG images'),
+        'from-png': ('png2tex', [], 'convert PNG images to TEX files'),
+    },
+    'par': {
+        'dump': ('par2csv', [], 'decompile a PAR file to CSV files'),
+        'compile': ('csv2par', [], 'compile CSV files to a PAR file'),
+        'diff': ('pardiff', [], 'compare two PAR files'),
+        'verify': ('parverify', [], 'check that a PAR file survives a CSV round trip'),
+        'sql': ('parsql', [], 'load a PAR file into SQLite'),
+        'columns': ('parcolumns', [], 'summarise numeric columns of a PAR file'),
+        'research': ('researchgraph', [], 'check and query the research tree of a PAR file'),
+    },
+}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='e2150', description='Tools for Earth 2150 game data.')
+    groups = parser.add_subparsers(dest='group', metavar='group', required=True)
+    for (group, group_commands) in commands.items():
+        group_parser = groups.add_parser(group, help=f'{group.upper()} files')
+        subcommands = group_parser.add_subparsers(dest='command', metavar='command', required=True)
+        for (command, (_, _, help)) in group_commands.items():
+            # Everything after the command, --help included, is left for the tool's own parser, which isn't imported until the command runs
+            subcommands.add_parser(command, help=help, add_help=False)
+    args, rest = parser.parse_known_args(argv)
+
+    module_name, extra, _ = commands[args.group][args.command]
+    module = importlib.import_module(f'{__package__ or "e2150"}.{module_name}')
+    return module.main(extra + rest, prog=f'e2150 {args.group} {args.command}')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,687 @@
+#!/usr/bin/env python3
+from io import BytesIO, TextIOWrapper
+from struct import pack
+
+import argparse
+import copy
+import csv
+import hashlib
+import json
+import os
+import os.path
+import struct
+import sys
+
+from .parschema import Faction, ResearchTab, schemas
+
+
+PAR_HEADER = b'PAR\x00\x99\x00\x00\x00'
+TERMINATOR = 0xffffffff
+
+CACHE_DIR = '.csv2par'
+CACHE_MAGIC = b'C2PC'
+# Bump whenever the encoded bytes for the same CSV file and schema would change
+ENCODER_VERSION = 1
+cache_header = struct.Struct('<4sI20s20s20sII')
+
+usage = 'To use this script, run it in a directory containing csv files generated by par2csv. It will compile them back into a new EARTH2150.par in the same directory.'
+
+
+class Research:
+    def __init__(self, previous, id, faction, campaign_cost, skirmish_cost, campaign_time, skirmish_time, name, video, type, mesh, meshParamsIndex, line=None):
+        self.previous = previous
+        self.id = id
+        self.faction = faction
+        self.campaign_cost = campaign_cost
+        self.skirmish_cost = skirmish_cost
+        self.campaign_time = campaign_time
+        self.skirmish_time = skirmish_time
+        self.name = name
+        self.video = video
+        self.type = type
+        self.mesh = mesh
+        self.meshParamsIndex = meshParamsIndex
+        self.line = line
+
+    @classmethod
+    def from_row(cls, row, id, line=None):
+        return cls(
+            previous=row[10].strip().split(),
+            id=id,
+            faction=Faction.__members__[row[1]],
+            campaign_cost=int(row[2]),
+            skirmish_cost=int(row[3]),
+            campaign_time=int(row[4]),
+            skirmish_time=int(row[5]),
+            name=row[0],
+            video=row[6],
+            type=ResearchTab.__members__[row[7]],
+            mesh=row[8],
+            meshParamsIndex=int(row[9]),
+            line=line)
+
+    def __repr__(self):
+        items = ', '.join(f'{k}={v!r}' for k, v in self.__dict__.items())
+        return 'Research{{{items}}}'
+
+
+class Entity:
+    def __init__(self, name, req_research, fields, line=None):
+        self.name = name
+        self.req_research = req_research
+        self.fields = fields
+        self.line = line
+
+    @classmethod
+    def from_row(cls, row, schema, line=None):
+        return cls(row[0], row[1].strip().split(), schema.decode(row[2:]), line)
+
+    def __repr__(self):
+        return f'Entity{{name={self.name!r}, req_research={self.req_research}, fields={len(self.fields)}{self.fields}}}'
+
+
+class EntityGroup:
+    def __init__(self):
+        self.faction = None
+        self.entity_type = None
+        self.entities = list()
+        self.ref_fields = None
+        self.schema = None
+
+    def __repr__(self):
+        entities = ''
+        for entity in self.entities:
+            entities += f'  {entity}\n'
+        return f'EntityGroup{{faction={self.faction}, entity_type={self.entity_type}, entities=\n{entities}}}'
+
+
+csv_files = [(name + '.csv', schema) for (name, schema) in schemas.items()]
+
+research_header = ['name', 'faction', 'campaign_cost', 'skirmish_cost', 'campaign_time', 'skirmish_time', 'video', 'type', 'mesh', 'meshParamsIndex', 'previous']
+# The Research attributes stored as plain 32-bit numbers
+research_numbers = ['campaign_cost', 'skirmish_cost', 'campaign_time', 'skirmish_time', 'meshParamsIndex']
+
+uint = struct.Struct('<I')
+TERMINATOR_BYTES = uint.pack(TERMINATOR)
+research_values = struct.Struct('<6I')
+
+# Steps of a compiled field layout
+RUN, STRING, TERMINATE = range(3)
+
+class FieldLayout:
+    """How to encode the fields of every entity whose values have one particular sequence of types.
+
+    Worked out once per layout: the field count and type mask, already
+    encoded, and steps listing the runs of plain values (each with a
+    precompiled struct), strings and terminators, so an entity's fields are
+    packed with one call per run rather than one per field.
+    """
+    __slots__ = ('head', 'steps')
+
+    def __init__(self, signature, ref_fields):
+        types = bytearray()
+        steps = []
+        run = []
+        run_start = 0
+
+        def end_run(i):
+            if run:
+                steps.append((RUN, run_start, i, struct.Struct('<' + ''.join(run))))
+                run.clear()
+
+        for (i, t) in enumerate(signature):
+            if t is str:
+                end_run(i)
+                steps.append((STRING, i, i + 1, None))
+                run_start = i + 1
+                types.append(1)
+            else:
+                types.append(0)
+                run.append('f' if t is float else 'I')
+            if i in ref_fields:
+                end_run(i + 1)
+                steps.append((TERMINATE, 0, 0, None))
+                run_start = i + 1
+                types.append(0)
+        end_run(len(signature))
+        self.head = uint.pack(len(types)) + bytes(types)
+        self.steps = tuple(steps)
+
+field_layouts = dict()
+
+def field_layout(signature, ref_fields):
+    key = (signature, ref_fields)
+    try:
+        return field_layouts[key]
+    except KeyError:
+        field_layouts[key] = FieldLayout(signature, ref_fields)
+        return field_layouts[key]
+
+def encode_string(out, value):
+    value = value.encode('latin_1')
+    out += uint.pack(len(value))
+    out += value
+
+def encode_entity(out, entity, layout, research_ids):
+    """Append one encoded entity to the bytearray out."""
+    name = entity.name.encode('latin_1')
+    req_research = [research_ids[r] for r in entity.req_research]
+    out += uint.pack(len(name))
+    out += name
+    out += pack(f'<{len(req_research) + 1}I', len(req_research), *req_research)
+    out += layout.head
+    fields = entity.fields
+    for (step, a, b, run) in layout.steps:
+        if step == RUN:
+            out += run.pack(*fields[a:b])
+        elif step == STRING:
+            value = fields[a].encode('latin_1')
+            out += uint.pack(len(value))
+            out += value
+        else:
+            out += TERMINATOR_BYTES
+
+def wrap_negative(value):
+    # Negative numbers are stored as 32-bit two's complement, which is how parcolumns' signed() reads them back
+    if type(value) is int and -0x80000000 <= value < 0:
+        return value & 0xffffffff
+    return value
+
+def value_problem(value):
+    """Why a field value can't be stored in 32 bits once wrap_negative() has been applied, or None if it can."""
+    if type(value) is int and not 0 <= value <= 0xffffffff:
+        return f'{value} does not fit in 32 bits'
+    if type(value) is float:
+        try:
+            struct.pack('<f', value)
+        except OverflowError:
+            return f'{value} is out of range for a 32-bit float'
+    return None
+
+def entity_problems(group, entity, research_ids):
+    """Why an entity can't be encoded, as 'file:line: column: message' strings."""
+    schema = group.schema
+    where = f'{schema.name}.csv:{entity.line}' if schema and entity.line else f'{group.faction} {group.entity_type.name} entity {entity.name!r}'
+    problems = [f'{where}: research: no research named {name!r}' for name in entity.req_research if name not in research_ids]
+    for (i, value) in enumerate(entity.fields):
+        problem = value_problem(wrap_negative(value))
+        if problem:
+            column = schema.columns[i].name if schema and i < len(schema.columns) else f'field{i}'
+            problems.append(f'{where}: {column}: {problem}')
+    return problems
+
+def encode_groups(entity_groups, research_ids):
+    """Encode entity groups, each one's faction, type and entity count followed by its entities.
+
+    Research prerequisites are given by name and resolved through
+    research_ids; each group's ref_fields lists the field indices that are
+    followed by a 0xffffffff terminator. Negative numbers are stored with
+    wrap_negative(), and InvalidValues is raised if any value can't be
+    stored at all.
+    """
+    out = bytearray()
+    problems = []
+    for group in entity_groups:
+        out += pack('<3I', group.faction.value, group.entity_type.value, len(group.entities))
+        ref_fields = frozenset(group.ref_fields)
+        for entity in group.entities:
+            layout = field_layout(tuple(map(type, entity.fields)), ref_fields)
+            start = len(out)
+            try:
+                encode_entity(out, entity, layout, research_ids)
+            except (struct.error, KeyError):
+                del out[start:]
+                failed = entity_problems(group, entity, research_ids)
+                if failed:
+                    problems += failed
+                    continue
+                encode_entity(out, Entity(entity.name, entity.req_research, [wrap_negative(v) for v in entity.fields], entity.line), layout, research_ids)
+    if problems:
+        raise InvalidValues(problems)
+    return out
+
+def encode_topic(out, r, research_ids):
+    """Append one encoded research topic to the bytearray out."""
+    previous = [research_ids[p] for p in r.previous]
+    out += pack(f'<{len(previous) + 1}I', len(previous), *previous)
+    out += research_values.pack(r.id, r.faction.value, r.campaign_cost, r.skirmish_cost, r.campaign_time, r.skirmish_time)
+    encode_string(out, r.name)
+    encode_string(out, r.video)
+    out += uint.pack(r.type.value)
+    encode_string(out, r.mesh)
+    out += uint.pack(r.meshParamsIndex)
+
+def topic_problems(r, research_ids):
+    """Why a research topic can't be encoded, as 'file:line: column: message' strings."""
+    where = f'research.csv:{r.line}' if r.line else f'research {r.name!r}'
+    problems = [f'{where}: previous: no research named {name!r}' for name in r.previous if name not in research_ids]
+    for column in research_numbers:
+        problem = value_problem(wrap_negative(getattr(r, column)))
+        if problem:
+            problems.append(f'{where}: {column}: {problem}')
+    return problems
+
+def encode_research(research, research_ids):
+    """Encode research topics, without the count that precedes them.
+
+    Like encode_groups(), negative numbers are wrapped and InvalidValues
+    raised for anything that can't be stored.
+    """
+    out = bytearray()
+    problems = []
+    for r in research:
+        start = len(out)
+        try:
+            encode_topic(out, r, research_ids)
+        except (struct.error, KeyError):
+            del out[start:]
+            failed = topic_problems(r, research_ids)
+            if failed:
+                problems += failed
+                continue
+            wrapped = copy.copy(r)
+            for column in research_numbers:
+                setattr(wrapped, column, wrap_negative(getattr(r, column)))
+            encode_topic(out, wrapped, research_ids)
+    if problems:
+        raise InvalidValues(problems)
+    return out
+
+def write_blobs(parfile, group_count, group_blobs, research_count, research_blob):
+    """Assemble a PAR file from already encoded groups and research, writing it in one go."""
+    parfile.write(b''.join([PAR_HEADER, pack('<2I', group_count, 0), *group_blobs, pack('<I', research_count), research_blob, pack('<2I', 1, research_count - 1)]))
+
+def write_par(parfile, entity_groups, research, research_ids):
+    """Write entity groups and research to an open PAR file."""
+    write_blobs(parfile, len(entity_groups), [encode_groups(entity_groups, research_ids)], len(research), encode_research(research, research_ids))
+
+
+def research_row_problems(row, line):
+    """Why a row of research.csv can't be read, as 'file:line: column: message' strings."""
+    if len(row) < len(research_header):
+        return [f'research.csv:{line}: expected {len(research_header)} columns, not {len(row)}']
+    problems = []
+    for (column, enum) in (('faction', Faction), ('type', ResearchTab)):
+        cell = row[research_header.index(column)]
+        if cell not in enum.__members__:
+            problems.append(f'research.csv:{line}: {column}: expected one of {", ".join(enum.__members__)}, not {cell!r}')
+    for column in research_numbers:
+        cell = row[research_header.index(column)]
+        try:
+            int(cell)
+        except ValueError:
+            problems.append(f'research.csv:{line}: {column}: expected int, not {cell!r}')
+    return problems
+
+def read_research(reader):
+    """Research topics from the rows of research.csv, header included, numbered in the order they appear.
+
+    Raises InvalidValues, listing every cell that couldn't be converted, if
+    any row can't be read.
+    """
+    next(reader) # Skip header line
+    research = []
+    problems = []
+    for (id, row) in enumerate(reader):
+        try:
+            research.append(Research.from_row(row, id, id + 2))
+        except (ValueError, KeyError, IndexError):
+            problems += research_row_problems(row, id + 2)
+    if problems:
+        raise InvalidValues(problems)
+    return research
+
+def read_groups(reader, schema):
+    """Entity groups from the rows of one entity CSV file, header included, converted according to its schema.
+
+    Raises InvalidValues, listing every cell that couldn't be converted, if
+    any row can't be read.
+    """
+    filename = schema.name + '.csv'
+    entity_groups = []
+    problems = []
+    next(reader) # Skip header line
+    group = None
+    for (line, row) in enumerate(reader, 2):
+        if not row: continue
+        if len(row) < 3:
+            group = EntityGroup()
+            group.faction = Faction.__members__.get(row[-1])
+            if group.faction is None:
+                problems.append(f'{filename}:{line}: faction: expected one of {", ".join(Faction.__members__)}, not {row[-1]!r}')
+            group.entity_type = schema.entity_type
+            group.ref_fields = schema.ref_fields
+            group.schema = schema
+            entity_groups.append(group)
+        elif group is None:
+            problems.append(f'{filename}:{line}: entity {row[0]!r} comes before any faction row')
+        else:
+            try:
+                group.entities.append(Entity.from_row(row, schema, line))
+            except ValueError as e:
+                problems.append(f'{filename}:{line}: {e}')
+    if problems:
+        raise InvalidValues(problems)
+    return entity_groups
+
+
+class InvalidValues(ValueError):
+    """Raised instead of compiling when CSV cells can't be converted to the values their columns hold."""
+    def __init__(self, problems):
+        super().__init__(f'{len(problems)} invalid value{"s" if len(problems) != 1 else ""}')
+        self.problems = problems
+
+    def __reduce__(self):
+        # Raised in worker processes too, and sent back by pickling
+        return (type(self), (self.problems,))
+
+
+class InvalidReferences(ValueError):
+    """Raised instead of compiling when the CSV files refer to research or entities that don't exist."""
+    def __init__(self, problems):
+        super().__init__(f'{len(problems)} broken reference{"s" if len(problems) != 1 else ""}')
+        self.problems = problems
+
+
+def summarize_references(rows, schema=None):
+    """The names one CSV file defines and the distinct names it refers to, for references_resolve().
+
+    rows are the file's rows, header included, and schema is None for
+    research.csv. Returns [names, research_refs, entity_refs] as lists of
+    names, small enough for a BlobCache to keep between builds.
+    """
+    names = []
+    research_refs = set()
+    entity_refs = set()
+    if schema is None:
+        for (line, row) in enumerate(rows):
+            if line == 0 or not row:
+                continue
+            names.append(row[0])
+            if len(row) > 10:
+                research_refs.update(row[10].split())
+    else:
+        ref_columns = [i + 2 for i in sorted(schema.ref_fields)]
+        for (line, row) in enumerate(rows):
+            if line == 0 or len(row) < 3:
+                continue
+            names.append(row[0])
+            research_refs.update(row[1].split())
+            entity_refs.update(row[i] for i in ref_columns if i < len(row) and row[i])
+    return [names, sorted(research_refs), sorted(entity_refs)]
+
+def references_resolve(research_summary, table_summaries):
+    """Whether every reference in the summarized files resolves, without saying where one doesn't."""
+    research_names = set(research_summary[0])
+    if len(research_names) != len(research_summary[0]):
+        return False
+    entity_names = {name for summary in table_summaries for name in summary[0]}
+    return all(research_names.issuperset(summary[1]) for summary in [research_summary, *table_summaries]) and all(entity_names.issuperset(summary[2]) for summary in table_summaries)
+
+def check_references(research_rows, tables):
+    """Check every research and $ reference in the CSV files before anything is encoded.
+
+    research_rows are the rows of research.csv and tables a list of
+    (filename, schema, rows), headers included. The files are scanned once,
+    collecting names into sets and references into a list, then each
+    reference is looked up. Returns a list of problems as
+    'file:line: column: message' strings, empty if everything resolves.
+    """
+    problems = []
+    research_names = set()
+    entity_names = set()
+    research_refs = []
+    entity_refs = []
+
+    for (line, row) in enumerate(research_rows):
+        if line == 0 or not row:
+            continue
+        if row[0] in research_names:
+            problems.append(f'research.csv:{line + 1}: name: research {row[0]!r} is defined more than once')
+        research_names.add(row[0])
+        if len(row) > 10:
+            research_refs.extend(('research.csv', line + 1, 'previous', name) for name in row[10].split())
+
+    for (filename, schema, rows) in tables:
+        ref_columns = [(i + 2, schema.columns[i].name) for i in sorted(schema.ref_fields)]
+        for (line, row) in enumerate(rows):
+            if line == 0 or len(row) < 3:
+                continue
+            entity_names.add(row[0])
+            research_refs.extend((filename, line + 1, 'research', name) for name in row[1].split())
+            for (i, column) in ref_columns:
+                if i < len(row) and row[i]:
+                    entity_refs.append((filename, line + 1, column, row[i]))
+
+    for (filename, line, column, name) in research_refs:
+        if name not in research_names:
+            problems.append(f'{filename}:{line}: {column}: no research named {name!r}')
+    for (filename, line, column, name) in entity_refs:
+        if name not in entity_names:
+            problems.append(f'{filename}:{line}: {column}: no entity named {name!r}')
+    return problems
+
+
+def reference_problems(research_data, files, cache=None):
+    """check_references() on research.csv and the entity CSV files, given as bytes, going by their summaries first.
+
+    files are (filename, schema, data, digest) tuples, digest being a hash
+    of data if cache is a BlobCache to keep summarize_references() of each
+    file in, so only files that changed are scanned. The files are only
+    checked line by line, to say where, if something doesn't resolve.
+    """
+    summaries = []
+    for (filename, schema, data, digest) in files:
+        summary = cache.get_references(filename, digest) if cache else None
+        if summary is None:
+            summary = summarize_references(read_csv(data), schema)
+            if cache:
+                cache.put_references(filename, digest, summary)
+        summaries.append(summary)
+    if references_resolve(summarize_references(read_csv(research_data)), summaries):
+        return []
+    return check_references(read_csv(research_data), [(filename, schema, read_csv(data)) for (filename, schema, data, _) in files])
+
+def read_files(cache=None, verbose=False):
+    """The entity CSV files in the current directory as (filename, schema, data, digest), digest only if there is a cache."""
+    files = []
+    for (filename, schema) in csv_files:
+        try:
+            with open(filename, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            if verbose:
+                print(f'{filename} not found')
+            continue
+        files.append((filename, schema, data, hashlib.sha1(data).digest() if cache else None))
+    return files
+
+def check_files(cache=None):
+    """reference_problems() for the CSV files in the current directory."""
+    with open('research.csv', 'rb') as f:
+        research_data = f.read()
+    return reference_problems(research_data, read_files(cache), cache)
+
+
+def layout_digest(schema=None):
+    """A hash of everything in a schema that decides how a CSV file is encoded, or of research.csv's fixed layout if schema is None."""
+    if schema is None:
+        layout = ['research']
+    else:
+        layout = [schema.name, str(schema.entity_type.value)]
+        for column in schema.columns:
+            layout.append(f'{column.name}:{column.kind}')
+            if column.enum is not None:
+                layout.extend(f'{name}={member.value}' for (name, member) in column.enum.__members__.items())
+    return hashlib.sha1('\n'.join(layout).encode('utf-8')).digest()
+
+
+class BlobCache:
+    """Encoded groups and research from earlier runs, one file per CSV file in directory.
+
+    Each entry is keyed by a hash of its CSV file, a hash of the research
+    names in order, since encoded groups refer to research by position, and
+    a hash of the file's schema (see layout_digest()), and records the
+    ENCODER_VERSION that wrote it. Entries are rewritten whenever any of
+    these changes. Alongside them are
+    summarize_references() of each file for the reference check, which
+    depend only on the file itself.
+    """
+    def __init__(self, directory=CACHE_DIR):
+        self.directory = directory
+
+    def path(self, filename):
+        return os.path.join(self.directory, filename + '.bin')
+
+    def get(self, filename, digest, research_digest, layout):
+        """(group count, entity count, encoded bytes) from the cache, or None if missing or stale."""
+        try:
+            with open(self.path(filename), 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None
+        if len(data) < cache_header.size:
+            return None
+        magic, version, cached_digest, cached_research_digest, cached_layout, groups, entities = cache_header.unpack_from(data)
+        if (magic, version, cached_digest, cached_research_digest, cached_layout) != (CACHE_MAGIC, ENCODER_VERSION, digest, research_digest, layout):
+            return None
+        return groups, entities, data[cache_header.size:]
+
+    def put(self, filename, digest, research_digest, layout, groups, entities, blob):
+        os.makedirs(self.directory, exist_ok=True)
+        path = self.path(filename)
+        with open(path + '.tmp', 'wb') as f:
+            f.write(cache_header.pack(CACHE_MAGIC, ENCODER_VERSION, digest, research_digest, layout, groups, entities))
+            f.write(blob)
+        os.replace(path + '.tmp', path)
+
+    def get_references(self, filename, digest):
+        """summarize_references() of a CSV file from the cache, or None if missing or stale."""
+        try:
+            with open(os.path.join(self.directory, filename + '.refs')) as f:
+                cached_digest, *summary = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return None
+        return summary if cached_digest == digest.hex() else None
+
+    def put_references(self, filename, digest, summary):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, filename + '.refs')
+        with open(path + '.tmp', 'w') as f:
+            json.dump([digest.hex(), *summary], f, separators=(',', ':'))
+        os.replace(path + '.tmp', path)
+
+
+def read_csv(data):
+    """Rows of a CSV file already read into memory as bytes, decoded the way open() would."""
+    return csv.reader(TextIOWrapper(BytesIO(data), newline=''))
+
+worker_research_ids = None
+
+def init_worker(research_ids):
+    global worker_research_ids
+    worker_research_ids = research_ids
+
+def encode_csv(name, data, research_ids=None):
+    """Parse and encode one entity CSV file, given as bytes. Returns (group count, entity count, encoded groups).
+
+    In a worker process research_ids comes from init_worker, so it is only
+    sent once per worker rather than with every file.
+    """
+    entity_groups = read_groups(read_csv(data), schemas[name])
+    return len(entity_groups), sum(len(g.entities) for g in entity_groups), encode_groups(entity_groups, research_ids or worker_research_ids)
+
+def build(output='EARTH2150.par', cache=None, jobs=1, check=True, verbose=True):
+    """Compile the CSV files in the current directory into a PAR file.
+
+    With a BlobCache, only CSV files that changed since the last build are
+    parsed and encoded. With more than one job (or 0 for one per CPU), the
+    files that need encoding are parsed in a process pool, each worker
+    sending back the encoded bytes of a whole file; the results are put
+    together in csv_files order, so the output is the same either way.
+    Unless check is false, every reference is checked first and
+    InvalidReferences raised, before anything is written, if any are broken.
+    Only the names each file defines and refers to are needed for that, and
+    a BlobCache keeps them, so only changed files are scanned; if anything
+    is broken, the files are checked again line by line to say where.
+    Returns the number of groups, entities and research topics written.
+    """
+    with open('research.csv', 'rb') as f:
+        research_data = f.read()
+    research = read_research(read_csv(research_data))
+    research_ids = {r.name : r.id for r in research}
+    if cache:
+        research_digest = hashlib.sha1(research_data).digest()
+        names_digest = hashlib.sha1('\n'.join(r.name for r in research).encode('utf-8')).digest()
+        cached = cache.get('research.csv', research_digest, names_digest, layout_digest())
+        if cached is None:
+            research_blob = encode_research(research, research_ids)
+            cache.put('research.csv', research_digest, names_digest, layout_digest(), 0, 0, research_blob)
+        else:
+            research_blob = cached[2]
+    else:
+        research_blob = encode_research(research, research_ids)
+
+    encoded = []
+    pending = []
+    files = read_files(cache, verbose)
+    if check:
+        problems = reference_problems(research_data, files, cache)
+        if problems:
+            raise InvalidReferences(problems)
+
+    for (filename, schema, data, digest) in files:
+        cached = cache.get(filename, digest, names_digest, layout_digest(schema)) if cache else None
+        if cached is None:
+            if verbose:
+                print(f'Reading {filename}')
+            pending.append((len(encoded), filename, schema, digest, data))
+        encoded.append(cached)
+
+    if jobs != 1 and len(pending) > 1:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(jobs or None, initializer=init_worker, initargs=(research_ids,)) as pool:
+            results = list(pool.map(encode_csv, [p[2].name for p in pending], [p[4] for p in pending]))
+    else:
+        results = [encode_csv(schema.name, data, research_ids) for (_, _, schema, _, data) in pending]
+    for ((slot, filename, schema, digest, _), result) in zip(pending, results):
+        encoded[slot] = result
+        if cache:
+            cache.put(filename, digest, names_digest, layout_digest(schema), *result)
+
+    group_count = sum(groups for (groups, _, _) in encoded)
+    entity_count = sum(entities for (_, entities, _) in encoded)
+    with open(output, 'wb') as parfile:
+        write_blobs(parfile, group_count, [blob for (_, _, blob) in encoded], len(research), research_blob)
+    return group_count, entity_count, len(research)
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description=usage)
+    parser.add_argument('-i', '--incremental', action='store_true', help=f'only re-encode CSV files that changed since the last incremental build, keeping encoded files in {CACHE_DIR}')
+    parser.add_argument('--cache', default=CACHE_DIR, help=f'where to keep encoded files for --incremental, and the reference summaries --check and --incremental reuse (default {CACHE_DIR})')
+    parser.add_argument('-j', '--jobs', type=int, default=1, help='number of worker processes to parse CSV files with (default 1, 0 for the CPU count)')
+    parser.add_argument('-c', '--check', action='store_true', help='only check the CSV files for broken references, without compiling them; only files changed since the last check or incremental build are scanned')
+    parser.add_argument('--no-check', action='store_true', help="don't check references before compiling")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.check:
+            problems = check_files(BlobCache(args.cache))
+            for problem in problems:
+                print(problem)
+            return 1 if problems else 0
+        group_count, entity_count, research_count = build(cache=BlobCache(args.cache) if args.incremental else None, jobs=args.jobs, check=not args.no_check)
+    except FileNotFoundError:
+        print(usage)
+        return 1
+    except (InvalidValues, InvalidReferences) as e:
+        for problem in e.problems:
+            print(problem)
+        print(f'{e}; EARTH2150.par was not written')
+        return 1
+    print(f'Wrote EARTH2150.par containing {entity_count} entities (in {group_count} groups) and {research_count} research topics')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
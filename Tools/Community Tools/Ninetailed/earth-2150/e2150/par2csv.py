@@ -0,0 +1,283 @@
+#!/usr/bin/env python3
+import argparse
+import csv
+import mmap
+import os
+import os.path
+import struct
+import sys
+
+from .parschema import EntityType, Faction, ResearchTab, entity_schema
+
+
+usage = '''par2csv.py [parfile]
+This script will decompile the specified PAR file (EARTH2150.par in the current directory by default) and dump its contents to a series of CSV files in the current directory.\
+'''
+
+uint = struct.Struct('<I')
+int_runs = dict()
+
+def int_run(count):
+    # One precompiled struct per run length, shared by every entity that uses it
+    try:
+        return int_runs[count]
+    except KeyError:
+        int_runs[count] = struct.Struct(f'<{count}I')
+        return int_runs[count]
+
+read_plans = dict()
+
+def read_plan(field_types):
+    """How to read an entity with the given field type mask, worked out once per distinct mask.
+
+    A list of (is_string, count, run) steps: a run of count strings, or of
+    count integers unpacked with the struct run. An integer run straight
+    after strings starts with the place where the -1 after a reference
+    string would be.
+    """
+    try:
+        return read_plans[field_types]
+    except KeyError:
+        pass
+    plan = []
+    start = 0
+    for i in range(1, len(field_types) + 1):
+        if i == len(field_types) or bool(field_types[i]) != bool(field_types[start]):
+            count = i - start
+            if field_types[start]:
+                plan.append((True, count, None))
+            else:
+                plan.append((False, count, int_run(count)))
+            start = i
+    read_plans[field_types] = plan
+    return plan
+
+
+class Research:
+    def __init__(self, previous, id, faction, campaign_cost, skirmish_cost, campaign_time, skirmish_time, name, video, type, mesh, meshParamsIndex):
+        self.previous = previous
+        self.id = id
+        self.faction = faction
+        self.campaign_cost = campaign_cost
+        self.skirmish_cost = skirmish_cost
+        self.campaign_time = campaign_time
+        self.skirmish_time = skirmish_time
+        self.name = name
+        self.video = video
+        self.type = type
+        self.mesh = mesh
+        self.meshParamsIndex = meshParamsIndex
+
+    def __repr__(self):
+        items = ("%s=%r" % (k, v) for k, v in self.__dict__.items())
+        return "%s{%s}" % (self.__class__.__name__, ', '.join(items))
+
+
+class Entity:
+    def __init__(self, name, req_research, fields):
+        self.name = name
+        self.req_research = req_research
+        self.fields = fields
+
+    def __repr__(self):
+        return f'Entity{{name={self.name!r}, req_research={self.req_research}, fields={len(self.fields)}{self.fields}}}'
+
+
+class EntityGroup:
+    def __init__(self, faction, entity_type, entities):
+        self.faction = faction
+        self.entity_type = entity_type
+        self.entities = entities
+
+    def __repr__(self):
+        entities = ''
+        for entity in self.entities:
+            entities += f'  {entity}\n'
+        return f'EntityGroup{{faction={self.faction}, entity_type={self.entity_type}, entities=\n{entities}}}'
+
+
+class ParReader:
+    """Walks a PAR file held in a buffer with precompiled structs, without copying it.
+
+    Entities are read by following a read_plan for their field type mask,
+    so consecutive integer fields are unpacked with a single call and the
+    mask is only examined the first time it is seen.
+    """
+    def __init__(self, buf):
+        self.buf = memoryview(buf)
+        self.pos = 0
+
+    def read_int(self):
+        value, = uint.unpack_from(self.buf, self.pos)
+        self.pos += 4
+        return value
+
+    def read_ints(self, count):
+        values = int_run(count).unpack_from(self.buf, self.pos)
+        self.pos += 4 * count
+        return values
+
+    def read_string(self):
+        length = self.read_int()
+        end = self.pos + length
+        if end > len(self.buf):
+            raise ValueError(f'String of length {length} at offset {self.pos - 4} runs past the end of the file')
+        value = str(self.buf[self.pos:end], 'latin_1')
+        self.pos = end
+        return value
+
+    def read_list(self):
+        return list(self.read_ints(self.read_int()))
+
+    def read_entity(self):
+        buf = self.buf
+        size = len(buf)
+        unpack_uint = uint.unpack_from
+        name = self.read_string()
+        req_research = self.read_list()
+        field_count = self.read_int()
+        pos = self.pos
+        plan = read_plan(bytes(buf[pos:pos + field_count]))
+        pos += field_count
+        fields = list()
+        after_string = False
+        for (is_string, count, run) in plan:
+            if is_string:
+                for _ in range(count):
+                    length, = unpack_uint(buf, pos)
+                    pos += 4
+                    end = pos + length
+                    if end > size:
+                        raise ValueError(f'String of length {length} at offset {pos - 4} runs past the end of the file')
+                    fields.append(str(buf[pos:end], 'latin_1'))
+                    pos = end
+            else:
+                values = run.unpack_from(buf, pos)
+                pos += 4 * count
+                # Skip the -1 after every string
+                if after_string and values[0] == 0xffffffff:
+                    fields.extend(values[1:])
+                else:
+                    fields.extend(values)
+            after_string = is_string
+        self.pos = pos
+        return Entity(name, req_research, fields)
+
+    def read_group(self):
+        faction, entity_type, entity_count = self.read_ints(3)
+        return EntityGroup(Faction(faction), EntityType(entity_type), [self.read_entity() for _ in range(entity_count)])
+
+    def read_research(self):
+        previous = self.read_list()
+        id, faction, campaign_cost, skirmish_cost, campaign_time, skirmish_time = self.read_ints(6)
+        name = self.read_string()
+        video = self.read_string()
+        type = ResearchTab(self.read_int())
+        mesh = self.read_string()
+        meshParamsIndex = self.read_int()
+        return Research(previous, id, Faction(faction), campaign_cost, skirmish_cost, campaign_time, skirmish_time, name, video, type, mesh, meshParamsIndex)
+
+    def read_par(self):
+        """Parse a whole PAR file into its entity groups and research topics."""
+        self.pos = 8
+        entity_group_count = self.read_int()
+        self.pos = 16
+        entity_groups = [self.read_group() for _ in range(entity_group_count)]
+        research_count = self.read_int()
+        research = [self.read_research() for _ in range(research_count)]
+        return entity_groups, research
+
+
+def parse_par(buf):
+    return ParReader(buf).read_par()
+
+def read_par(filename):
+    with open(filename, 'rb') as parfile, mmap.mmap(parfile.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        reader = ParReader(buf)
+        try:
+            return reader.read_par()
+        finally:
+            reader.buf.release()
+
+
+def csv_header(entity_group):
+    """The name of the CSV file an entity group goes in (without extension) and that file's header row."""
+    schema = entity_schema(entity_group)
+    return schema.name, schema.header
+
+
+class CsvFileManager:
+    def __init__(self, directory=os.curdir):
+        self.directory = directory
+        self.files = dict()
+        self.writers = dict()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+    def get(self, entity_group):
+        name, header = csv_header(entity_group)
+        if name not in self.writers:
+            path = os.path.relpath(name + '.csv', self.directory)
+            self.files[name] = open(path, 'w', newline='')
+            self.writers[name] = csv.writer(self.files[name], lineterminator='\n')
+            self.writers[name].writerow(header)
+        return self.writers[name]
+
+    def __repr__(self):
+        return f'FileManager{{directory={self.directory!r}, files={list(self.files.keys())}}}'
+
+
+def resnames(research_names, ids):
+    return ' '.join(research_names[id] for id in ids)
+
+research_header = ['name', 'faction', 'campaign_cost', 'skirmish_cost', 'campaign_time', 'skirmish_time', 'video', 'type', 'mesh', 'meshParamsIndex', 'previous']
+
+def research_rows(research):
+    """The rows of research.csv after its header, in ID order."""
+    research_names = {r.id: r.name for r in research}
+    for r in sorted(research, key=lambda r: r.id):
+        yield [r.name, r.faction, r.campaign_cost, r.skirmish_cost, r.campaign_time, r.skirmish_time, r.video, r.type, r.mesh, r.meshParamsIndex, resnames(research_names, r.previous)]
+
+def group_rows(i, entity_group, research_names):
+    """The rows an entity group is written as: a group line, one row per entity and a blank separator."""
+    encode = entity_schema(entity_group).encode
+    yield [f'Group {i}', entity_group.faction.name]
+    for e in entity_group.entities:
+        yield [e.name, resnames(research_names, e.req_research)] + encode(e.fields)
+    yield []
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description='Decompile a PAR file and dump its contents to a series of CSV files in the current directory.')
+    parser.add_argument('parfile', nargs='?', default='EARTH2150.par', help='the PAR file to decompile (default: EARTH2150.par)')
+    filename = parser.parse_args(argv).parfile
+
+    try:
+        entity_groups, research = read_par(filename)
+    except FileNotFoundError:
+        print(usage if prog is None else usage.replace('par2csv.py', prog, 1))
+        return 1
+    research_names = {r.id: r.name for r in research}
+
+    with open('research.csv', 'w') as csvfile:
+        writer = csv.writer(csvfile, lineterminator='\n')
+        writer.writerow(research_header)
+        writer.writerows(research_rows(research))
+        print('Wrote research to research.csv')
+
+    with CsvFileManager() as fm:
+        for (i, group) in enumerate(entity_groups):
+            fm.get(group).writerows(group_rows(i, group, research_names))
+        print(f"Wrote entities to {', '.join(name + '.csv' for name in fm.files.keys())}.")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
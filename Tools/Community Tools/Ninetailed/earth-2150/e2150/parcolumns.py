@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+from array import array
+
+import argparse
+import mmap
+import sys
+
+from .par2csv import ParReader
+from .parschema import EntityType, group_schema
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+
+class Row:
+    """A view of one entity in a ColumnGroup. Field values are read from the group's columns on access."""
+    __slots__ = ('group', 'index')
+
+    def __init__(self, group, index):
+        self.group = group
+        self.index = index
+
+    @property
+    def name(self):
+        return self.group.names[self.index]
+
+    @property
+    def req_research(self):
+        return self.group.research(self.index)
+
+    @property
+    def fields(self):
+        fields = [column[self.index] for column in self.group.columns.values()]
+        # Columns past the end of a shorter entity are padded with None
+        while fields and fields[-1] is None:
+            fields.pop()
+        return fields
+
+    def __getitem__(self, column):
+        return self.group.columns[column][self.index]
+
+    def __getattr__(self, column):
+        try:
+            return self.group.columns[column][self.index]
+        except KeyError:
+            raise AttributeError(column) from None
+
+    def __repr__(self):
+        return f'Row{{name={self.name!r}, req_research={self.req_research}, fields={self.fields}}}'
+
+
+class ColumnGroup:
+    """One entity group stored column by column.
+
+    Integer fields live in array('I') columns (viewable as NumPy arrays
+    without copying) and string fields in lists of interned strings, so
+    repeated values such as meshes and references are stored once per
+    process however many groups or PAR files use them. Research
+    requirements are kept as one flat array of IDs plus offsets into it.
+    Where entities have different numbers of fields, the shorter ones are
+    padded with None, and columns holding padding are kept as lists.
+    """
+    def __init__(self, faction, entity_type, name, class_id, columns, names, req_offsets, req_ids):
+        self.faction = faction
+        self.entity_type = entity_type
+        self.name = name
+        self.class_id = class_id
+        self.columns = columns
+        self.names = names
+        self.req_offsets = req_offsets
+        self.req_ids = req_ids
+
+    @classmethod
+    def from_group(cls, entity_group):
+        name, class_id, schema = group_schema(entity_group)
+        entities = entity_group.entities
+        width = max((len(e.fields) for e in entities), default=len(schema))
+        # As in parsql, known columns keep their names and any beyond the schema are numbered
+        schema = schema[:width] + [f'field{i}' for i in range(len(schema), width)]
+
+        columns = dict()
+        for (i, column) in enumerate(schema):
+            values = [entity.fields[i] if i < len(entity.fields) else None for entity in entities]
+            if all(type(v) is int for v in values):
+                columns[column] = array('I', values)
+            else:
+                columns[column] = [sys.intern(v) if type(v) is str else v for v in values]
+
+        req_offsets = array('I', [0])
+        req_ids = array('I')
+        for entity in entities:
+            req_ids.extend(entity.req_research)
+            req_offsets.append(len(req_ids))
+        return cls(entity_group.faction, entity_group.entity_type, name, class_id, columns, [sys.intern(e.name) for e in entities], req_offsets, req_ids)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __getitem__(self, index):
+        return Row(self, index)
+
+    def __iter__(self):
+        return (Row(self, i) for i in range(len(self.names)))
+
+    def __repr__(self):
+        return f'ColumnGroup{{faction={self.faction}, entity_type={self.entity_type}, name={self.name!r}, entities={len(self)}, columns={list(self.columns)}}}'
+
+    def research(self, index):
+        return list(self.req_ids[self.req_offsets[index]:self.req_offsets[index + 1]])
+
+    def column(self, name):
+        """A column as a NumPy array sharing the group's memory for integer fields (a plain array or list without NumPy)."""
+        values = self.columns[name]
+        if numpy is not None and isinstance(values, array):
+            return numpy.frombuffer(values, dtype=numpy.uint32)
+        return values
+
+    def signed(self, name):
+        """An integer column reinterpreted as signed, for fields where 0xffffffff means -1 (a NumPy array, or a copy as array('i') without NumPy)."""
+        if numpy is not None:
+            return numpy.frombuffer(self.columns[name], dtype=numpy.int32)
+        values = array('i')
+        values.frombytes(self.columns[name].tobytes())
+        return values
+
+
+class ColumnarPar:
+    """A whole PAR file as ColumnGroups plus its research topics."""
+    def __init__(self, groups, research):
+        self.groups = groups
+        self.research = research
+
+    def __repr__(self):
+        return f'ColumnarPar{{groups={len(self.groups)}, entities={sum(len(g) for g in self.groups)}, research={len(self.research)}}}'
+
+    def find(self, entity_type=None, name=None):
+        """Groups of the given EntityType and/or CSV name (e.g. 'vehicle', 'cannon')."""
+        return [g for g in self.groups if (entity_type is None or g.entity_type == entity_type) and (name is None or g.name == name)]
+
+    def column(self, column, entity_type=None, name=None):
+        """One column concatenated over every matching group that has it, e.g. par.column('hp', EntityType.Vehicle)."""
+        parts = [g.column(column) for g in self.find(entity_type, name) if column in g.columns]
+        if numpy is not None:
+            return numpy.concatenate(parts) if parts else numpy.zeros(0, dtype=numpy.uint32)
+        return [v for part in parts for v in part]
+
+    def stats(self, column, entity_type=None, name=None):
+        values = self.column(column, entity_type, name)
+        if numpy is not None and values.dtype == object:
+            values = numpy.array([v for v in values if v is not None], dtype=numpy.uint32)
+        elif numpy is None:
+            values = [v for v in values if v is not None]
+        if not len(values):
+            return None
+        if numpy is not None:
+            return {'count': len(values), 'min': int(values.min()), 'max': int(values.max()), 'mean': float(values.mean()), 'sum': int(values.sum(dtype=numpy.uint64))}
+        return {'count': len(values), 'min': min(values), 'max': max(values), 'mean': sum(values) / len(values), 'sum': sum(values)}
+
+
+def read_columns(reader):
+    """Parse a PAR file into columnar form one group at a time, so only one group's entity objects exist at once."""
+    reader.pos = 8
+    entity_group_count = reader.read_int()
+    reader.pos = 16
+    groups = [ColumnGroup.from_group(reader.read_group()) for _ in range(entity_group_count)]
+    research = [reader.read_research() for _ in range(reader.read_int())]
+    return ColumnarPar(groups, research)
+
+def load_columns(filename):
+    with open(filename, 'rb') as parfile, mmap.mmap(parfile.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+        reader = ParReader(buf)
+        try:
+            return read_columns(reader)
+        finally:
+            reader.buf.release()
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description='Load a PAR file into columnar form and print summary statistics for numeric columns across every group that has them.')
+    parser.add_argument('parfile', help='the PAR file to read')
+    parser.add_argument('columns', nargs='*', default=['hp'], metavar='column', help='columns to summarise (default: hp)')
+    args = parser.parse_args(argv)
+
+    par = load_columns(args.parfile)
+    print(par)
+    for column in args.columns:
+        for entity_type in EntityType:
+            stats = par.stats(column, entity_type)
+            if stats:
+                print(f'{entity_type.name}.{column}: ' + ', '.join(f'{k}={v:g}' if isinstance(v, float) else f'{k}={v}' for (k, v) in stats.items()))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
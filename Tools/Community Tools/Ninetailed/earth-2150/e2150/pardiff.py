@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+import argparse
+import json
+import sys
+
+from .par2csv import read_par
+from .parschema import group_schema
+
+
+research_columns = ['faction', 'campaign_cost', 'skirmish_cost', 'campaign_time', 'skirmish_time', 'video', 'type', 'mesh', 'meshParamsIndex']
+
+
+class Snapshot:
+    """What one entity or research topic looks like in one PAR file, reduced to comparable values.
+
+    Research IDs are replaced by names, so renumbering alone is not a
+    change, and the whole record is hashed once so unchanged records can
+    be skipped with a single comparison.
+    """
+    __slots__ = ('table', 'faction', 'columns', 'research', 'fields', 'digest')
+
+    def __init__(self, table, faction, columns, research, fields):
+        self.table = table
+        self.faction = faction
+        self.columns = columns
+        self.research = research
+        self.fields = fields
+        self.digest = hash((table, faction, research, fields))
+
+    def __eq__(self, other):
+        return self.digest == other.digest and (self.table, self.faction, self.research, self.fields) == (other.table, other.faction, other.research, other.fields)
+
+
+def unique_key(index, name):
+    # Entities sharing a name are told apart by the order they appear in
+    key = name
+    n = 2
+    while key in index:
+        key = f'{name}#{n}'
+        n += 1
+    return key
+
+def index_entities(entity_groups, research):
+    names = {r.id: r.name for r in research}
+    index = dict()
+    for group in entity_groups:
+        if not group.entities:
+            continue
+        table, _, columns = group_schema(group)
+        for entity in group.entities:
+            index[unique_key(index, entity.name)] = Snapshot(table, group.faction.name, columns, tuple(names.get(i, i) for i in entity.req_research), tuple(entity.fields))
+    return index
+
+def index_research(research):
+    names = {r.id: r.name for r in research}
+    index = dict()
+    for r in research:
+        fields = tuple(v.name if hasattr(v, 'name') else v for v in (getattr(r, c) for c in research_columns))
+        index[unique_key(index, r.name)] = Snapshot('research', r.faction.name, research_columns, tuple(names.get(i, i) for i in r.previous), fields)
+    return index
+
+def column_name(old, new, i):
+    for snapshot in (new, old):
+        if i < len(snapshot.columns):
+            return snapshot.columns[i]
+    return f'field{i}'
+
+def diff_snapshots(old, new):
+    """The differences between two snapshots of the same record, as {column: [old, new]}."""
+    changes = dict()
+    if old.table != new.table:
+        changes['table'] = [old.table, new.table]
+    if old.faction != new.faction:
+        changes['faction'] = [old.faction, new.faction]
+    if old.research != new.research:
+        changes['research'] = [list(old.research), list(new.research)]
+    if old.fields != new.fields:
+        for i in range(max(len(old.fields), len(new.fields))):
+            before = old.fields[i] if i < len(old.fields) else None
+            after = new.fields[i] if i < len(new.fields) else None
+            if before != after:
+                changes[column_name(old, new, i)] = [before, after]
+    return changes
+
+def diff_index(old, new):
+    added = [{'name': name, 'table': new[name].table, 'faction': new[name].faction} for name in new if name not in old]
+    removed = [{'name': name, 'table': old[name].table, 'faction': old[name].faction} for name in old if name not in new]
+    changed = []
+    for (name, before) in old.items():
+        after = new.get(name)
+        if after is not None and not before == after:
+            changed.append({'name': name, 'table': after.table, 'faction': after.faction, 'changes': diff_snapshots(before, after)})
+    return {'added': added, 'removed': removed, 'changed': changed}
+
+def diff_par(old, new):
+    """Compare two parsed PAR files, each given as (entity_groups, research).
+
+    Entities and research are matched by name, so moving them around the
+    file is not reported. Returns {'entities': ..., 'research': ...}, each
+    with lists of added, removed and changed records; changes are keyed
+    by column name as in the CSV files.
+    """
+    (old_groups, old_research), (new_groups, new_research) = old, new
+    return {
+        'entities': diff_index(index_entities(old_groups, old_research), index_entities(new_groups, new_research)),
+        'research': diff_index(index_research(old_research), index_research(new_research)),
+    }
+
+def print_diff(diff):
+    for (kind, section) in diff.items():
+        for record in section['added']:
+            print(f'+ {record["table"]} {record["name"]} ({record["faction"]})')
+        for record in section['removed']:
+            print(f'- {record["table"]} {record["name"]} ({record["faction"]})')
+        for record in section['changed']:
+            print(f'~ {record["table"]} {record["name"]} ({record["faction"]})')
+            for (column, (before, after)) in record['changes'].items():
+                print(f'    {column}: {before!r} -> {after!r}')
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description='Show what changed between two PAR files, entity by entity and field by field.')
+    parser.add_argument('old', help='the original PAR file')
+    parser.add_argument('new', help='the changed PAR file')
+    parser.add_argument('--json', action='store_true', help='print the differences as JSON')
+    args = parser.parse_args(argv)
+
+    diff = diff_par(read_par(args.old), read_par(args.new))
+    if args.json:
+        print(json.dumps(diff, indent=2))
+    else:
+        print_diff(diff)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,327 @@
+from enum import Enum, unique
+
+import struct
+
+
+class Faction(Enum):
+    NEUTRAL = 0
+    UCS = 1
+    ED = 2
+    LC = 3
+
+    def __str__(self):
+        return self.name
+
+
+class EntityType(Enum):
+    Vehicle = 1
+    Cannon = 2
+    Missile = 3
+    Building = 4
+    Special = 5
+    Equipment = 6
+    ShieldGenerator = 7
+    SoundPack = 8
+    SpecialUpdatesLinks = 9
+    Parameters = 10
+
+
+class ResearchTab(Enum):
+    CHASSIS = 0
+    WEAPON = 1
+    AMMO = 2
+    SPECIAL = 3
+
+    def __str__(self):
+        return self.name
+
+
+@unique
+class EntityClass(Enum):
+    # Vehicle
+    VEHICLE              = 0x00c00101
+    #MOVEABLE             = 0x00c00101
+    SUPPLYTRANSPORTER    = 0x01c00101
+    BUILDROBOT           = 0x02c00101
+    MININGROBOT          = 0x04c00101
+    SAPPERROBOT          = 0x08c00101
+    # Cannon
+    CANNON               = 0x00000102
+    # Missile
+    MISSILE              = 0x00010401
+    # Building
+    BUILDING             = 0x00010101
+    # Special
+    PASSIVE              = 0x00000201
+    MINE                 = 0x00000801
+    MULTIEXPLOSION       = 0x00010004
+    BUILDPASSIVE         = 0x00010201
+    PLATOON              = 0x00020101
+    TRANSIENTPASSIVE     = 0x00020201
+    EXPLOSION            = 0x00020401
+    FLYINGWASTE          = 0x00040401
+    UPGRADECOPULA        = 0x00001002
+    STARTINGPOSITIONMARK = 0x00080101
+    SMOKE                = 0x00080401
+    ARTEFACT             = 0x01020201
+    EXPLOSIONEX          = 0x01020401
+    BUILDINGTRANSPORTER  = 0x01040101
+    WALLLASER            = 0x01100401
+    RESOURCETRANSPORTER  = 0x02040101
+    BUILDERLINE          = 0x02100401
+    UNITTRANSPORTER      = 0x04040101
+    # Equipment
+    EQUIPMENT            = 0x00000002
+    REPAIRER             = 0x00000202
+    CONTAINERTRANSPORTER = 0x00000402
+    LOOKROUNDEQUIPMENT   = 0x00000802
+    TRANSPORTERHOOK      = 0x00002002
+
+    def __repr__(self):
+        return self.name
+
+
+type_field_map = {
+    EntityType.Vehicle: ['classID', 'mesh', 'shadowType', 'viewParamsIndex', 'cost', 'timeOfBuild', '$soundPackID', '$smokeID', '$killExplosionID', '$destructedID', 'hp', 'regenerationHP', 'armour', 'calorificCapacity', 'disableResist', 'storeableFlags', 'standType', 'sightRange', '$talkPackID', '$shieldGeneratorID', 'maxShieldUpdate', 'slot1Type', 'slot2Type', 'slot3Type', 'slot4Type', 'soilSpeed', 'roadSpeed', 'sandSpeed', 'bankSpeed', 'waterSpeed', 'deepWaterSpeed', 'airSpeed', 'objectType', '$engineSmokeID', '$dustID', '$billowID', '$standBillowID', '$trackID'],
+    EntityType.Cannon: ['classID', 'mesh', 'shadowType', 'viewParamsIndex', 'cost', 'timeOfBuild', '$soundPackID', '$smokeID', '$killExplosionID', '$destructedID', 'rangeOfSight', 'plugType', 'slotType', 'maxAlphaPerTick', 'maxBetaPerTick', 'alphaMargin', 'betaMargin', 'barrelBetaType', 'barrelBetaAngle', 'barrelCount', '$ammoID', 'ammoType', 'targetType', 'rangeOfFire', 'plusDamage', 'fireType', 'shootDelay', 'needExternal', 'reloadDelay', 'maxAmmo', '$barrelExplosionID'],
+    EntityType.Missile: ['classID', 'mesh', 'shadowType', 'viewParamsIndex', 'cost', 'timeOfBuild', '$soundPackID', '$smokeID', '$killExplosionID', '$destructedID', 'hp', 'regenerationHP', 'armour', 'calorificCapacity', 'disableResist', 'resistantFlags', 'standType', 'type', 'rocketType', 'missileSize', '$rocketDummyID', 'IsAntiRocketTarget', 'speed', 'timeOfShoot', 'plusRangeOfFire', 'hitType', 'hitRange', 'typeOfDamage', 'damage', '$explosionID'],
+    EntityType.Building: ['classID', 'mesh', 'shadowType', 'viewParamsIndex', 'cost', 'timeOfBuild', '$soundPackID', '$smokeID', '$killExplosionID', '$destructedID', 'hp', 'regenerationHP', 'armour', 'calorificCapacity', 'disableResist', 'storeableFlags', 'standType', 'sightRange', '$talkPackID', '$shieldGeneratorID', 'maxShieldUpdate', 'slot1Type', 'slot2Type', 'slot3Type', 'slot4Type', 'buildingType', 'buildingTypeEx', 'buildingTabType', '$initCannonID1', '$initCannonID2', '$initCannonID3', '$initCannonID4', '$copulaID', 'buildingTunnelNumber', '$upgradeCopulaSmallID', '$upgradeCopulaBigID', '$buildLCTransporterID', '$chimneySmokeID', 'needPower', '$slaveBuildingID', 'maxSubBuildingsCount', 'powerLevel', 'powerTransmitterRange', 'connectTransmitterRange', 'fullEnergyPowerInDay', 'resourceInputOutput', 'ticPerContainer', '$containerID', 'containerSmeltingTicks', 'resourcesPerTransport', '$transporterID', '$buildingAmmoID', 'rangeOfBuildingFire', '$shootExplosionID', 'ammoReloadTime', '$buildExplosion', 'copulaAnimationFlags', 'endOfClosingCopulaAnimation', '$laserID', 'spaceStationType'],
+    EntityType.Special: ['classID', 'mesh', 'shadowType', 'viewParamsIndex', 'cost', 'timeOfBuild', '$soundPackID', '$smokeID', '$killExplosionID', '$destructedID'],
+    EntityType.Equipment: ['classID', 'mesh', 'shadowType', 'viewParamsIndex', 'cost', 'timeOfBuild', '$soundPackID', '$smokeID', '$killExplosionID', '$destructedID', 'rangeOfSight', 'plugType', 'slotType', 'maxAlphaPerTick', 'maxBetaPerTick'],
+    EntityType.ShieldGenerator: ['shieldCost', 'shieldValue', 'reloadTime', 'shieldMeshName', 'shieldMeshViewIndex'],
+    EntityType.SpecialUpdatesLinks: ['$specialUpdateLink']
+}
+
+class_field_map = {
+    EntityClass.SUPPLYTRANSPORTER: ['ammoCapacity', 'animSupplyDownStart', 'animSupplyDownEnd', 'animSupplyUpStart', 'animSupplyUpEnd'],
+    EntityClass.BUILDROBOT: ['$wallD', '$bridgeID', 'tunnelNumber', 'roadBuildTime', 'flatBuildTime', 'trenchBuildTime', 'tunnelBuildTime', 'buildObjectAnimationAngle', 'digNormalAnimationAngle', 'digLowAnimationAngle', 'animBuildObjectStartStart', 'animBuildObjectStartEnd', 'animBuildObjectWorkStart', 'animBuildObjectWorkEnd', 'animBuildObjectEndStart', 'animBuildObjectEndEnd', 'animDigNormalStartStart', 'animDigNormalStartEnd', 'animDigNormalWorkStart', 'animDigNormalWorkEnd', 'animDigNormalEndStart', 'animDigNormalEndEnd', 'animDigLowStartStart', 'animDigLowStartEnd', 'animDigLowWorkStart', 'animDigLowWorkEnd', 'animDigLowEndStart', 'animDigLowEndEnd', '$digSmokeID'],
+    EntityClass.MININGROBOT: ['containersCnt', 'ticksPerContainer', 'putResourceAngle', 'animHarvestStartStart', 'animHarvestStartEnd', 'animHarvestWorkStart', 'animHarvestWorkEnd', 'animHarvestEndStart', 'animHarvestEndEnd', '$harvestSmokeID'],
+    EntityClass.SAPPERROBOT: ['minesLookRange', '$mineID', 'maxMinesCount', 'animDownStart', 'animDownEnd', 'animUpStart', 'animUpEnd', '$putMineSmokeID'],
+    EntityClass.PASSIVE: ['hp', 'regenerationHP', 'armour', 'calorificCapacity', 'disableResist', 'storeableFlags', 'standType', 'passiveMask', '$wallCopulaID'],
+    EntityClass.MINE: ['hp', 'regenerationHP', 'armour', 'calorificCapacity', 'disableResist', 'storeableFlags', 'standType', 'mineSize', 'mineTypeOfDamage', 'mineDamage'],
+    EntityClass.MULTIEXPLOSION: ['useDownBuilding', 'downBuildingStart', 'downBuildingTime', '$subObject1', 'time1', 'angle1', 'dist4X1', '$subObject2', 'time2', 'angle2', 'dist4X2', '$subObject3', 'time3', 'angle3', 'dist4X3', '$subObject4', 'time4', 'angle4', 'dist4X4', '$subObject5', 'time5', 'angle5', 'dist4X5', '$subObject6', 'time6', 'angle6', 'dist4X6', '$subObject7', 'time7', 'angle7', 'dist4X7', '$subObject8', 'time8', 'angle8', 'dist4X8'],
+    EntityClass.BUILDPASSIVE: ['hp', 'regenerationHP', 'armour', 'calorificCapacity', 'disableResist', 'storeableFlags', 'standType', 'passiveMask', '$wallCopulaID'],
+    EntityClass.PLATOON: ['hp', 'regenerationHP', 'armour', 'calorificCapacity', 'disableResist', 'storeableFlags', 'standType', 'sightRange', '$talkPackID', '$shieldGeneratorID', 'maxShieldUpdate', 'slot1Type', 'slot2Type', 'slot3Type', 'slot4Type'],
+    EntityClass.TRANSIENTPASSIVE: ['hp', 'regenerationHP', 'armour', 'calorificCapacity', 'disableResist', 'storeableFlags', 'standType', 'passiveMask', '$wallCopulaID'],
+    EntityClass.EXPLOSION: ['hp', 'regenerationHP', 'armour', 'calorificCapacity', 'disableResist', 'storeableFlags', 'standType', 'explosionTicks', 'explosionFlags'],
+    EntityClass.EXPLOSIONEX: ['hp', 'regenerationHP', 'armour', 'calorificCapacity', 'disableResist', 'storeableFlags', 'standType', 'explosionTicks', 'explosionFlags'],
+    EntityClass.FLYINGWASTE: ['hp', 'regenerationHP', 'armour', 'calorificCapacity', 'disableResist', 'storeableFlags', 'standType', 'wasteSize', '$subWasteID1', 'subWaste1Alpha', '$subWasteID2', 'subWaste2Alpha', '$subWasteID3', 'subWaste3Alpha', '$subWasteID4', 'subWaste4Alpha', 'flightTime', 'wasteSpeed', 'wasteDistanceX4', 'wasteBeta'],
+    EntityClass.UPGRADECOPULA: ['rangeOfSight', 'plugType', 'slotType', 'maxAlphaPerTick', 'maxBetaPerTick'],
+    EntityClass.STARTINGPOSITIONMARK: ['hp', 'regenerationHP', 'armour', 'calorificCapacity', 'disableResist', 'storeableFlags', 'standType', 'sightRange', '$talkPackID', '$shieldGeneratorID', 'maxShieldUpdate', 'slot1Type', 'slot2Type', 'slot3Type', 'slot4Type', 'positionType'],
+    EntityClass.SMOKE: ['hp', 'regenerationHP', 'armour', 'calorificCapacity', 'disableResist', 'storeableFlags', 'standType', 'mesh1', 'mesh2', 'mesh3', 'smokeTime1', 'smokeTime2', 'smokeTime3', 'smokeFrequency', 'startingTime', 'smokingTime', 'endingTime', 'smokeUpSpeed', 'newSmokeDistance'],
+    EntityClass.ARTEFACT: ['hp', 'regenerationHP', 'armour', 'calorificCapacity', 'disableResist', 'storeableFlags', 'standType', 'passiveMask', '$wallCopulaID', 'artefactMask', 'artefactParam', 'respawnTime'],
+    EntityClass.BUILDINGTRANSPORTER: ['hp', 'regenerationHP', 'armour', 'calorificCapacity', 'disableResist', 'storeableFlags', 'standType', 'sightRange', '$talkPackID', '$shieldGeneratorID', 'maxShieldUpdate', 'slot1Type', 'slot2Type', 'slot3Type', 'slot4Type', 'vehicleSpeed', 'verticalVehicleAnimationType', '$builderLineID'],
+    EntityClass.WALLLASER: ['hp', 'regenerationHP', 'armour', 'calorificCapacity', 'disableResist', 'storeableFlags', 'standType'],
+    EntityClass.RESOURCETRANSPORTER: ['hp', 'regenerationHP', 'armour', 'calorificCapacity', 'disableResist', 'storeableFlags', 'standType', 'sightRange', '$talkPackID', '$shieldGeneratorID', 'maxShieldUpdate', 'slot1Type', 'slot2Type', 'slot3Type', 'slot4Type', 'vehicleSpeed', 'verticalVehicleAnimationType', 'resourceVehicleType', 'animatedTransporterStop', 'showVideoPerTransportersCount', 'totalOrbitalMoney'],
+    EntityClass.BUILDERLINE: ['hp', 'regenerationHP', 'armour', 'calorificCapacity', 'disableResist', 'storeableFlags', 'standType'],
+    EntityClass.UNITTRANSPORTER: ['hp', 'regenerationHP', 'armour', 'calorificCapacity', 'disableResist', 'storeableFlags', 'standType', 'sightRange', '$talkPackID', '$shieldGeneratorID', 'maxShieldUpdate', 'slot1Type', 'slot2Type', 'slot3Type', 'slot4Type', 'vehicleSpeed', 'verticalVehicleAnimationType', 'unitsCount', 'dockingHeight', 'animLoadingStartStart', 'animLoadingStartEnd', 'animLoadingEndStart', 'animLoadingEndEnd', 'animUnloadingStartStart', 'animUnloadingStartEnd', 'animUnloadingEndStart', 'animUnloadingEndEnd'],
+    EntityClass.REPAIRER: ['repairerFlags', 'repairHPPerTick', 'repairElectronicsPerTick', 'ticksPerRepair', 'convertTankTime', 'convertBuildingTime', 'convertHealthyTankTime', 'convertHealthyBuildingTime', 'repaintTankTime', 'repaintBuildingTime', 'upgradeTankTime', 'animRepairStartStart', 'animRepairStartEnd', 'animRepairWorkStart', 'animRepairWorkEnd', 'animRepairEndStart', 'animRepairEndEnd', 'animConvertStartStart', 'animConvertStartEnd', 'animConvertWorkStart', 'animConvertWorkEnd', 'animConvertEndStart', 'animConvertEndEnd', 'animRepaintStartStart', 'animRepaintStartEnd', 'animRepaintWorkStart', 'animRepaintWorkEnd', 'animRepaintEndStart', 'animRepaintEndEnd'],
+    EntityClass.CONTAINERTRANSPORTER: ['animContainerDownStart', 'animContainerDownEnd', 'animContainerUpStart', 'animContainerUpEnd'],
+    EntityClass.LOOKROUNDEQUIPMENT: ['lookRoundTypeMask', 'lookRoundRange', 'turnSpeed', 'bannerAddExperienceLevel', 'regenerationHPMultiple', 'shieldReloadAdd'],
+    EntityClass.TRANSPORTERHOOK: ['animTransporterDownStart', 'animTransporterDownEnd', 'animTransporterUpStart', 'animTransporterUpEnd', 'angleToGetPut', 'angleOfGetUnitByLandTransporter', 'takeHeight']
+}
+
+sound_field_map = {
+    'talkpack': ['selected', 'move', 'attack', 'command', 'enemy', 'help', 'freeWay'],
+    'playertalkpack': ['baseUnderAttack', 'buildingUnderAttack', 'spacePortUnderAttack', 'enemyLandInBase', 'lowMaterials', 'lowMaterialsInBase', 'lowPower', 'lowPowerInBase', 'researchComplete', 'productionStarted', 'productionCompleted', 'productionCanceled', 'platoonLost', 'platoonCreated', 'platoonDisbanded', 'unitLost', 'transporterArrived', 'artefactLocated', 'artefactRecovered', 'newAreaLocationFound', 'enemyMainBaseLocated', 'newSourceFieldLocated', 'sourceFieldExploited', 'buildingLost'],
+    'soundpack': ['normalWavePack1', 'normalWavePack2', 'normalWavePack3', 'normalWavePack4', 'loopedWavePack1', 'loopedWavePack2', 'loopedWavePack3', 'loopedWavePack4']
+}
+
+
+# Column types. Anything not listed in column_types is an integer, except that columns whose names start with $
+# are references to other entities by name, stored as a string followed by a 0xffffffff terminator.
+INT = 'int'
+STRING = 'string'
+ENUM = 'enum'
+FLOAT = 'float'
+REF = 'ref'
+
+column_types = {
+    'classID': ENUM,
+    'mesh': STRING,
+    'mesh1': STRING,
+    'mesh2': STRING,
+    'mesh3': STRING,
+    'shieldMeshName': STRING
+}
+
+column_enums = {
+    'classID': EntityClass
+}
+
+
+def guess(value):
+    # For columns without a declared type: the parameters file and fields past the end of a known layout
+    digits = value[1:] if value.startswith('-') else value
+    return int(value) if digits.isascii() and digits.isdigit() else value
+
+def enum_decoder(enum):
+    """Read an enum column given either as a member name or as its raw value, returning the raw value."""
+    members = {name: member.value for (name, member) in enum.__members__.items()}
+    def decode(value):
+        return members[value] if value in members else int(value)
+    return decode
+
+def float_from_bits(value):
+    return struct.unpack('<f', struct.pack('<I', value))[0]
+
+
+class Column:
+    """One typed column of a CSV file, with the functions that convert its cells to field values and back."""
+    __slots__ = ('name', 'kind', 'enum', 'decode', 'encode')
+
+    def __init__(self, name, kind=None):
+        self.name = name
+        self.kind = kind or (REF if name.startswith('$') else column_types.get(name, INT))
+        self.enum = column_enums.get(name) if self.kind == ENUM else None
+        self.encode = None
+        if self.kind == INT:
+            self.decode = int
+        elif self.kind == FLOAT:
+            self.decode = float
+            self.encode = float_from_bits
+        elif self.kind == ENUM:
+            self.decode = enum_decoder(self.enum)
+        else:
+            self.decode = str
+
+    def __repr__(self):
+        return f'Column{{name={self.name!r}, kind={self.kind}}}'
+
+
+class Schema:
+    """The typed layout of one CSV file and of the entity groups stored in it.
+
+    decode() turns the field cells of a CSV row into field values with one
+    converter per column, and encode() does the reverse for values read
+    from a PAR file. ref_fields holds the indices of the reference columns,
+    the ones followed by a 0xffffffff terminator in the PAR file.
+    """
+    def __init__(self, name, entity_type, class_id, columns):
+        self.name = name
+        self.entity_type = entity_type
+        self.class_id = class_id
+        self.columns = tuple(columns)
+        self.column_names = [c.name for c in self.columns]
+        self.ref_fields = frozenset(i for (i, c) in enumerate(self.columns) if c.kind == REF)
+        self.decoders = tuple(c.decode for c in self.columns)
+        self.encoders = tuple(c.encode for c in self.columns)
+        if not any(self.encoders):
+            self.encoders = None
+        if entity_type in (EntityType.SoundPack, EntityType.Parameters):
+            self.header = self.column_names
+        else:
+            self.header = ['name', 'research'] + self.column_names
+
+    def __repr__(self):
+        return f'Schema{{name={self.name!r}, entity_type={self.entity_type}, class_id={self.class_id!r}, columns={self.column_names}}}'
+
+    def decode(self, cells):
+        try:
+            fields = [decode(cell) for (decode, cell) in zip(self.decoders, cells)]
+        except ValueError:
+            for (column, cell) in zip(self.columns, cells):
+                try:
+                    column.decode(cell)
+                except ValueError:
+                    raise ValueError(f'{column.name}: expected {column.kind}, not {cell!r}') from None
+            raise
+        if len(cells) > len(self.decoders):
+            fields += [guess(cell) for cell in cells[len(self.decoders):]]
+        return fields
+
+    def encode(self, fields):
+        if self.encoders is None:
+            return fields
+        return [encode(value) if encode and type(value) is int else value for (encode, value) in zip(self.encoders, fields)] + fields[len(self.encoders):]
+
+
+# Every CSV file, in the order csv2par reads them and so the order their groups end up in
+tables = [
+    ('buildrobot', EntityType.Vehicle),
+    ('vehicle', EntityType.Vehicle),
+    ('miningrobot', EntityType.Vehicle),
+    ('sapperrobot', EntityType.Vehicle),
+    ('supplytransporter', EntityType.Vehicle),
+    ('buildingtransporter', EntityType.Special),
+    ('resourcetransporter', EntityType.Special),
+    ('unittransporter', EntityType.Special),
+    ('building', EntityType.Building),
+    ('cannon', EntityType.Cannon),
+    ('missile', EntityType.Missile),
+    ('soundpack', EntityType.SoundPack),
+    ('repairer', EntityType.Equipment),
+    ('containertransporter', EntityType.Equipment),
+    ('transporterhook', EntityType.Equipment),
+    ('lookroundequipment', EntityType.Equipment),
+    ('upgradecopula', EntityType.Special),
+    ('equipment', EntityType.Equipment),
+    ('passive', EntityType.Special),
+    ('artefact', EntityType.Special),
+    ('startingpositionmark', EntityType.Special),
+    ('multiexplosion', EntityType.Special),
+    ('explosion', EntityType.Special),
+    ('smoke', EntityType.Special),
+    ('flyingwaste', EntityType.Special),
+    ('mine', EntityType.Special),
+    ('walllaser', EntityType.Special),
+    ('builderline', EntityType.Special),
+    ('platoon', EntityType.Special),
+    ('shieldgenerator', EntityType.ShieldGenerator),
+    ('talkpack', EntityType.SoundPack),
+    ('parameters', EntityType.Parameters),
+    ('playertalkpack', EntityType.SoundPack),
+    ('specialupdateslinks', EntityType.SpecialUpdatesLinks)
+]
+
+def table_schema(name, entity_type, class_id=None):
+    if name in sound_field_map:
+        return Schema(name, entity_type, None, [Column(c, STRING) for c in sound_field_map[name]])
+    if entity_type == EntityType.Parameters:
+        return Schema(name, entity_type, None, [])
+    if class_id is None:
+        class_id = EntityClass.__members__.get(name.upper())
+    return Schema(name, entity_type, class_id, [Column(c) for c in type_field_map.get(entity_type, []) + class_field_map.get(class_id, [])])
+
+schemas = {name: table_schema(name, entity_type) for (name, entity_type) in tables}
+
+
+def table_name(entity_group):
+    """The CSV file an entity group goes in (without extension) and its class ID where it has one, worked out from its type and first entity."""
+    class_id = None
+    if entity_group.entity_type in [EntityType.Vehicle, EntityType.Cannon, EntityType.Missile, EntityType.Building, EntityType.Special, EntityType.Equipment]:
+        try:
+            class_id = EntityClass(entity_group.entities[0].fields[0])
+            if class_id == EntityClass.EXPLOSIONEX:
+                class_id = EntityClass.EXPLOSION
+            elif class_id in [EntityClass.BUILDPASSIVE, EntityClass.TRANSIENTPASSIVE]:
+                class_id = EntityClass.PASSIVE
+            return EntityClass(class_id).name.lower(), class_id
+        except ValueError:
+            value = entity_group.entities[0].fields[0]
+            raise ValueError(f'{entity_group.faction} {entity_group.entity_type.name} group: unknown class ID {value:08x}' if type(value) is int else f'{entity_group.faction} {entity_group.entity_type.name} group: class ID {value!r} is not a number') from None
+    elif entity_group.entity_type == EntityType.SoundPack:
+        first_name = entity_group.entities[0].name
+        if first_name.startswith('TALK_'):
+            return 'talkpack', None
+        elif first_name.startswith('PLAYERTALK_'):
+            return 'playertalkpack', None
+        else:
+            return 'soundpack', None
+    return entity_group.entity_type.name.lower(), None
+
+def entity_schema(entity_group):
+    name, class_id = table_name(entity_group)
+    schema = schemas.get(name)
+    if schema is None or schema.entity_type != entity_group.entity_type:
+        schema = table_schema(name, entity_group.entity_type, class_id)
+    return schema
+
+def group_schema(entity_group):
+    """Work out what an entity group holds from its type and first entity.
+
+    Returns the group's CSV file name (without extension), its class ID
+    where it has one and the names of its entities' fields.
+    """
+    schema = entity_schema(entity_group)
+    return schema.name, schema.class_id, schema.column_names
@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sqlite3
+import sys
+
+from . import csv2par
+from .par2csv import read_par
+from .parschema import EntityType, Faction, ResearchTab, group_schema
+
+
+research_columns = ['name', 'faction', 'campaign_cost', 'skirmish_cost', 'campaign_time', 'skirmish_time', 'video', 'type', 'mesh', 'meshParamsIndex']
+
+
+def quote(name):
+    return '"' + name.replace('"', '""') + '"'
+
+def table_columns(entity_groups):
+    """Field column names for each table, widened to the longest entity seen in any of its groups."""
+    tables = dict()
+    for group in entity_groups:
+        name, _, schema = group_schema(group)
+        width = max((len(e.fields) for e in group.entities), default=0)
+        columns = tables.get(name, [])
+        if width > len(columns):
+            if len(schema) >= width:
+                columns = schema[:width]
+            else:
+                columns = schema + [f'field{i}' for i in range(len(schema), width)]
+        tables[name] = columns
+    return tables
+
+def dump(entity_groups, research, db):
+    """Store parsed PAR data in an SQLite database.
+
+    Every entity class gets its own table of fields, keyed by the entity's
+    position in the file, with its group recorded in the groups table.
+    Research prerequisites of entities and of research topics are kept in
+    entity_research and research_previous, in their original order. Names,
+    class IDs and every $ reference column are indexed.
+    """
+    tables = table_columns(entity_groups)
+    db.execute('CREATE TABLE groups (id INTEGER PRIMARY KEY, faction TEXT, entity_type TEXT, tbl TEXT)')
+    db.execute('CREATE TABLE research (id INTEGER PRIMARY KEY, ' + ', '.join(map(quote, research_columns)) + ')')
+    db.execute('CREATE TABLE research_previous (research_id INTEGER, position INTEGER, previous_id INTEGER, PRIMARY KEY (research_id, position))')
+    db.execute('CREATE TABLE entity_research (entity_id INTEGER, position INTEGER, research_id INTEGER, PRIMARY KEY (entity_id, position))')
+    for (table, columns) in tables.items():
+        db.execute(f'CREATE TABLE {quote(table)} (id INTEGER PRIMARY KEY, grp INTEGER, name TEXT, ' + ', '.join(map(quote, columns)) + ')')
+
+    rows = {table: [] for table in tables}
+    entity_research = []
+    groups = []
+    entity_id = 0
+    for (i, group) in enumerate(entity_groups):
+        table, _, _ = group_schema(group)
+        width = len(tables[table])
+        groups.append((i, group.faction.name, group.entity_type.name, table))
+        for entity in group.entities:
+            rows[table].append((entity_id, i, entity.name, *entity.fields, *([None] * (width - len(entity.fields)))))
+            entity_research.extend((entity_id, position, r) for (position, r) in enumerate(entity.req_research))
+            entity_id += 1
+
+    db.executemany('INSERT INTO groups VALUES (?, ?, ?, ?)', groups)
+    for (table, table_rows) in rows.items():
+        db.executemany(f'INSERT INTO {quote(table)} VALUES ({", ".join("?" * (len(tables[table]) + 3))})', table_rows)
+    db.executemany('INSERT INTO entity_research VALUES (?, ?, ?)', entity_research)
+    db.executemany(f'INSERT INTO research VALUES ({", ".join("?" * (len(research_columns) + 1))})',
+        ((r.id, r.name, r.faction.name, r.campaign_cost, r.skirmish_cost, r.campaign_time, r.skirmish_time, r.video, r.type.name, r.mesh, r.meshParamsIndex) for r in research))
+    db.executemany('INSERT INTO research_previous VALUES (?, ?, ?)', ((r.id, position, p) for r in research for (position, p) in enumerate(r.previous)))
+
+    for (table, columns) in tables.items():
+        db.execute(f'CREATE INDEX {quote(table + "_name")} ON {quote(table)} (name)')
+        db.execute(f'CREATE INDEX {quote(table + "_grp")} ON {quote(table)} (grp)')
+        for column in columns:
+            if column == 'classID' or column.startswith('$'):
+                db.execute(f'CREATE INDEX {quote(table + "_" + column)} ON {quote(table)} ({quote(column)})')
+    db.execute('CREATE INDEX research_name ON research (name)')
+    db.execute('CREATE INDEX research_previous_previous ON research_previous (previous_id)')
+    db.execute('CREATE INDEX entity_research_research ON entity_research (research_id)')
+    db.commit()
+
+def load(db):
+    """Read a database written by dump() back into csv2par's entity groups, research and research_ids."""
+    research_names = dict(db.execute('SELECT id, name FROM research'))
+    previous = dict()
+    for (research_id, previous_id) in db.execute('SELECT research_id, previous_id FROM research_previous ORDER BY research_id, position'):
+        previous.setdefault(research_id, []).append(research_names[previous_id])
+    research = [csv2par.Research(previous.get(row[0], []), row[0], Faction[row[2]], *row[3:7], row[1], row[7], ResearchTab[row[8]], row[9], row[10])
+        for row in db.execute('SELECT id, ' + ', '.join(map(quote, research_columns)) + ' FROM research ORDER BY id')]
+    research_ids = {r.name: r.id for r in research}
+
+    req_research = dict()
+    for (entity_id, research_id) in db.execute('SELECT entity_id, research_id FROM entity_research ORDER BY entity_id, position'):
+        req_research.setdefault(entity_id, []).append(research_names[research_id])
+
+    entity_groups = []
+    columns = dict()
+    for (group_id, faction, entity_type, table) in db.execute('SELECT id, faction, entity_type, tbl FROM groups ORDER BY id').fetchall():
+        if table not in columns:
+            columns[table] = [c[1] for c in db.execute(f'PRAGMA table_info({quote(table)})')][3:]
+        group = csv2par.EntityGroup()
+        group.faction = Faction[faction]
+        group.entity_type = EntityType[entity_type]
+        group.ref_fields = {i for (i, column) in enumerate(columns[table]) if column.startswith('$')}
+        for row in db.execute(f'SELECT * FROM {quote(table)} WHERE grp = ? ORDER BY id', (group_id,)):
+            fields = list(row[3:])
+            while fields and fields[-1] is None:
+                fields.pop()
+            group.entities.append(csv2par.Entity(row[2], req_research.get(row[0], []), fields))
+        entity_groups.append(group)
+    return entity_groups, research, research_ids
+
+def par2sql(parfile, dbfile):
+    if os.path.exists(dbfile):
+        os.remove(dbfile)
+    entity_groups, research = read_par(parfile)
+    with sqlite3.connect(dbfile) as db:
+        dump(entity_groups, research, db)
+    db.close()
+    return entity_groups, research
+
+def sql2par(dbfile, parfile):
+    with sqlite3.connect(dbfile) as db:
+        entity_groups, research, research_ids = load(db)
+    db.close()
+    with open(parfile, 'wb') as f:
+        csv2par.write_par(f, entity_groups, research, research_ids)
+    return entity_groups, research
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description='Convert PAR files to and from indexed SQLite databases.')
+    commands = parser.add_subparsers(dest='command', required=True)
+    command = commands.add_parser('dump', help='write a PAR file out as an SQLite database')
+    command.add_argument('parfile', nargs='?', default='EARTH2150.par')
+    command.add_argument('dbfile', nargs='?', default='EARTH2150.db')
+    command = commands.add_parser('compile', help='build a PAR file from an SQLite database')
+    command.add_argument('dbfile', nargs='?', default='EARTH2150.db')
+    command.add_argument('parfile', nargs='?', default='EARTH2150.par')
+    args = parser.parse_args(argv)
+
+    if args.command == 'dump':
+        entity_groups, research = par2sql(args.parfile, args.dbfile)
+        print(f'Wrote {sum(len(g.entities) for g in entity_groups)} entities and {len(research)} research topics to {args.dbfile}')
+    else:
+        entity_groups, research = sql2par(args.dbfile, args.parfile)
+        print(f'Wrote {args.parfile} containing {sum(len(g.entities) for g in entity_groups)} entities (in {len(entity_groups)} groups) and {len(research)} research topics')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
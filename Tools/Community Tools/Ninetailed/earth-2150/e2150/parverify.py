@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+from io import BytesIO
+
+import argparse
+import struct
+import sys
+import time
+import tracemalloc
+
+from . import csv2par
+from .par2csv import EntityGroup, ParReader, csv_header, group_rows, parse_par, research_header, research_rows, resnames
+from .parschema import EntityType, Faction, entity_schema, group_schema, schemas
+
+
+stages = ['read', 'dump', 'compile', 'write']
+
+
+def csv_value(value):
+    # What csv.writer would turn a value into, and so what csv2par would read back
+    return value if type(value) is str else str(value)
+
+def dump(entity_groups, research):
+    """The rows par2csv would write, as {file name: rows}, header included and with every value as text."""
+    tables = {'research.csv': [research_header] + [[csv_value(v) for v in row] for row in research_rows(research)]}
+    research_names = {r.id: r.name for r in research}
+    for (i, group) in enumerate(entity_groups):
+        name, header = csv_header(group)
+        rows = tables.setdefault(name + '.csv', [header])
+        rows.extend([csv_value(v) for v in row] for row in group_rows(i, group, research_names))
+    return tables
+
+def load(tables):
+    """Read the rows produced by dump() the way csv2par reads its CSV files."""
+    research = csv2par.read_research(iter(tables['research.csv']))
+    entity_groups = []
+    for (filename, schema) in csv2par.csv_files:
+        if filename in tables:
+            entity_groups += csv2par.read_groups(iter(tables[filename]), schema)
+    return entity_groups, research
+
+def write(entity_groups, research):
+    parfile = BytesIO()
+    csv2par.write_par(parfile, entity_groups, research, {r.name: r.id for r in research})
+    return parfile.getvalue()
+
+def staged(data, results):
+    """The stages of a round trip through par2csv and csv2par, each storing its output in results."""
+    yield 'read', lambda: results.__setitem__('read', parse_par(data))
+    yield 'dump', lambda: results.__setitem__('dump', dump(*results['read']))
+    yield 'compile', lambda: results.__setitem__('compile', load(results['dump']))
+    yield 'write', lambda: results.__setitem__('write', write(*results['compile']))
+
+def timed_round_trip(data):
+    """Per-stage wall times, then per-stage peak Python heap use from a second, traced run."""
+    times = dict()
+    results = dict()
+    for (stage, run) in staged(data, results):
+        start = time.perf_counter()
+        try:
+            run()
+        except Exception as e:
+            raise failure(stage, e, data, results) from e
+        times[stage] = time.perf_counter() - start
+    peaks = dict()
+    tracemalloc.start()
+    try:
+        for (stage, run) in staged(data, dict()):
+            tracemalloc.reset_peak()
+            run()
+            peaks[stage] = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return results, times, peaks
+
+
+def first_difference(a, b):
+    """The offset of the first byte that differs between a and b, or None if they are identical."""
+    if a == b:
+        return None
+    a = memoryview(a)
+    b = memoryview(b)
+    length = min(len(a), len(b))
+    low = 0
+    # Narrow down by comparing halves, which keeps every comparison in C
+    while length - low > 64:
+        mid = (low + length) // 2
+        if a[low:mid] == b[low:mid]:
+            low = mid
+        else:
+            length = mid
+    for i in range(low, length):
+        if a[i] != b[i]:
+            return i
+    return length
+
+def locate_entity(reader, start, offset, columns):
+    """Which part of the entity at start holds offset."""
+    reader.pos = start
+    reader.read_string()
+    if offset < reader.pos:
+        return 'name'
+    reader.read_list()
+    if offset < reader.pos:
+        return 'research'
+    field_count = reader.read_int()
+    field_types = bytes(reader.buf[reader.pos:reader.pos + field_count])
+    reader.pos += field_count
+    if offset < reader.pos:
+        return 'field types'
+    field = 0
+    after_string = False
+    for is_string in field_types:
+        if is_string:
+            reader.read_string()
+        elif reader.read_int() == 0xffffffff and after_string:
+            if offset < reader.pos:
+                return f'terminator after {column_label(columns, field - 1)}'
+            after_string = False
+            continue
+        if offset < reader.pos:
+            return column_label(columns, field)
+        field += 1
+        after_string = bool(is_string)
+    return 'end of entity'
+
+def column_label(columns, field):
+    return columns[field] if field < len(columns) else f'field{field}'
+
+def field_offset(reader, start, field):
+    """The offset of a field of the entity at start, counting fields as they appear in CSV files."""
+    reader.pos = start
+    reader.read_string()
+    reader.read_list()
+    field_count = reader.read_int()
+    field_types = bytes(reader.buf[reader.pos:reader.pos + field_count])
+    reader.pos += field_count
+    current = 0
+    after_string = False
+    for is_string in field_types:
+        offset = reader.pos
+        if is_string:
+            reader.read_string()
+        elif reader.read_int() == 0xffffffff and after_string:
+            after_string = False
+            continue
+        if current == field:
+            return offset
+        current += 1
+        after_string = bool(is_string)
+    return reader.pos
+
+def locate_research(reader, start, offset):
+    reader.pos = start
+    reader.read_list()
+    if offset < reader.pos:
+        return 'previous'
+    for column in ['id', 'faction', 'campaign_cost', 'skirmish_cost', 'campaign_time', 'skirmish_time']:
+        reader.read_int()
+        if offset < reader.pos:
+            return column
+    for (column, read) in [('name', reader.read_string), ('video', reader.read_string), ('type', reader.read_int), ('mesh', reader.read_string), ('meshParamsIndex', reader.read_int)]:
+        read()
+        if offset < reader.pos:
+            return column
+    return 'end of research'
+
+class Unreadable(ValueError):
+    """Raised by regions() at the first part of a PAR file that can't be parsed."""
+    def __init__(self, offset, where, error):
+        super().__init__(f'{where} at offset {offset:#x} is unreadable: {error}')
+        self.offset = offset
+        self.where = where
+        self.error = error
+
+
+def regions(data):
+    """The parts of a PAR file in order, as (start, end, description, part).
+
+    part is ('group', g) for a group header, ('entity', g, e, columns) for
+    an entity, ('research', r) for a research topic and None otherwise.
+    Parts are read one at a time, so this gets as far as the file can be
+    parsed and then raises Unreadable naming the part it couldn't read.
+    """
+    reader = ParReader(data)
+    start, where = 0, 'file header'
+    try:
+        if len(data) < 16:
+            raise ValueError(f'file is only {len(data)} bytes long')
+        yield 0, 16, where, None
+        reader.pos = 8
+        entity_group_count = reader.read_int()
+        reader.pos = 16
+        for g in range(entity_group_count):
+            start, where = reader.pos, f'group {g} header'
+            faction, entity_type, entity_count = reader.read_ints(3)
+            group = EntityGroup(Faction(faction), EntityType(entity_type), [])
+            yield start, reader.pos, where, ('group', g)
+            label = f'group {g}'
+            for e in range(entity_count):
+                start, where = reader.pos, f'{label}, entity {e}'
+                where = f'{label}, entity {reader.read_string()}'
+                reader.pos = start
+                entity = reader.read_entity()
+                if not group.entities:
+                    group.entities.append(entity)
+                    name, _, columns = group_schema(group)
+                    label = f'group {g} ({name}, {group.faction.name})'
+                yield start, reader.pos, f'{label}, entity {entity.name}', ('entity', g, e, columns)
+        start, where = reader.pos, 'research count'
+        research_count = reader.read_int()
+        yield start, reader.pos, where, None
+        for r in range(research_count):
+            start, where = reader.pos, f'research {r}'
+            research = reader.read_research()
+            yield start, reader.pos, f'research {research.name}', ('research', r)
+        yield reader.pos, len(data), 'file trailer', None
+    except (ValueError, IndexError, struct.error) as e:
+        raise Unreadable(start, where, e) from e
+    finally:
+        reader.buf.release()
+
+def locate(data, offset):
+    """Describe where in a PAR file offset falls, e.g. 'group 3 (vehicle, UCS), entity TANK, field hp'."""
+    reader = ParReader(data)
+    try:
+        for (start, end, description, part) in regions(data):
+            if offset < end:
+                if part and part[0] == 'entity':
+                    return f'{description}, {locate_entity(reader, start, offset, part[3])}'
+                if part and part[0] == 'research':
+                    return f'{description}, {locate_research(reader, start, offset)}'
+                return description
+        return 'past the end of the file'
+    except Unreadable:
+        return 'past the readable part of the file'
+    finally:
+        reader.buf.release()
+
+def position(data, part, field=None):
+    """The offset and description of a part of a PAR file, as found by regions(), and optionally of one of an entity's fields."""
+    for (start, end, description, found) in regions(data):
+        if found and found[:len(part)] == part:
+            if field is None:
+                return start, description
+            reader = ParReader(data)
+            try:
+                return field_offset(reader, start, field), f'{description}, {column_label(found[3], field)}'
+            finally:
+                reader.buf.release()
+    return None, None
+
+
+class VerifyError(Exception):
+    """A stage of the round trip failed. offset and where locate the part of the input it was working on, when that can be worked out."""
+    def __init__(self, stage, error, offset=None, where=None):
+        location = '' if offset is None else f' at offset {offset:#x} ({where})'
+        # csv2par's InvalidValues lists what was wrong in problems
+        detail = '; '.join(error.problems) if hasattr(error, 'problems') else error
+        super().__init__(f'{stage} failed{location}: {detail}')
+        self.stage = stage
+        self.error = error
+        self.offset = offset
+        self.where = where
+
+def failure(stage, error, data, results):
+    """A VerifyError for an exception raised by a round trip stage, locating the entity or research topic it was on."""
+    if stage == 'read':
+        # parse_par() doesn't say where it stopped, but regions() reads the same way and does
+        try:
+            for _ in regions(data):
+                pass
+        except Unreadable as e:
+            return VerifyError(stage, error, e.offset, e.where)
+        return VerifyError(stage, error)
+    part, field = failed_part(stage, results)
+    if part is None:
+        return VerifyError(stage, error)
+    try:
+        offset, where = position(data, part, field)
+    except Unreadable:
+        offset, where = None, None
+    return VerifyError(stage, error, offset, where)
+
+def compiled_group_order(tables):
+    """The input index of each group load() returns, in order, from the 'Group i' rows dump() wrote."""
+    order = []
+    for (filename, _) in csv2par.csv_files:
+        for row in tables.get(filename, [])[1:]:
+            if row and len(row) < 3:
+                order.append(int(row[0].split()[-1]))
+    return order
+
+def failed_part(stage, results):
+    """Which group, entity or research topic a failed stage was on, found by running it again on one at a time.
+
+    Returns (part, field) with part as in regions(), and the index of the
+    field that couldn't be converted where that is known.
+    """
+    if stage == 'dump':
+        entity_groups, research = results['read']
+        research_names = {r.id: r.name for r in research}
+        for (g, group) in enumerate(entity_groups):
+            try:
+                csv_header(group)
+                encode = entity_schema(group).encode
+            except Exception:
+                return ('group', g), None
+            for (e, entity) in enumerate(group.entities):
+                try:
+                    resnames(research_names, entity.req_research)
+                    encode(entity.fields)
+                except Exception:
+                    return ('entity', g, e), None
+        for (r, topic) in enumerate(research):
+            try:
+                resnames(research_names, topic.previous)
+            except Exception:
+                return ('research', r), None
+    elif stage == 'compile':
+        for (filename, rows) in results['dump'].items():
+            schema = schemas.get(filename[:-4])
+            if schema is None:
+                continue
+            g = e = None
+            for row in rows[1:]:
+                if len(row) < 3:
+                    if row:
+                        g, e = int(row[0].split()[-1]), 0
+                    continue
+                for (field, (column, cell)) in enumerate(zip(schema.columns, row[2:])):
+                    try:
+                        column.decode(cell)
+                    except Exception:
+                        return ('entity', g, e), field
+                e += 1
+    elif stage == 'write':
+        entity_groups, research = results['compile']
+        research_ids = {r.name: r.id for r in research}
+        # Compiled groups and research are in csv2par's order; regions() numbers them as they are in the input
+        group_order = compiled_group_order(results['dump'])
+        input_research = results['read'][1]
+        research_order = sorted(range(len(input_research)), key=lambda i: input_research[i].id)
+        for (g, group) in enumerate(entity_groups):
+            for (e, entity) in enumerate(group.entities):
+                single = csv2par.EntityGroup()
+                single.faction, single.entity_type, single.ref_fields, single.schema, single.entities = group.faction, group.entity_type, group.ref_fields, group.schema, [entity]
+                try:
+                    csv2par.encode_groups([single], research_ids)
+                except Exception:
+                    return ('entity', group_order[g], e), None
+        for (r, topic) in enumerate(research):
+            try:
+                csv2par.encode_research([topic], research_ids)
+            except Exception:
+                return ('research', research_order[r]), None
+    return None, None
+
+
+def verify(data):
+    """Round-trip a PAR file in memory. Returns (output, offset of the first difference or None, times, peaks).
+
+    Raises VerifyError, naming the stage and the part of data it was on, if
+    any stage fails.
+    """
+    results, times, peaks = timed_round_trip(data)
+    output = results['write']
+    return output, first_difference(data, output), times, peaks
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description='Check that par2csv followed by csv2par reproduces a PAR file exactly, without writing any CSV files.')
+    parser.add_argument('parfile', nargs='?', default='EARTH2150.par')
+    parser.add_argument('-o', '--output', help='also write the round-tripped PAR file here')
+    args = parser.parse_args(argv)
+
+    with open(args.parfile, 'rb') as parfile:
+        data = parfile.read()
+    try:
+        output, offset, times, peaks = verify(data)
+    except VerifyError as e:
+        print(f'{args.parfile}: {e}')
+        return 1
+    if args.output:
+        with open(args.output, 'wb') as parfile:
+            parfile.write(output)
+
+    for stage in stages:
+        print(f'{stage:8} {times[stage] * 1000:9.1f} ms {peaks[stage] / 1048576:8.1f} MiB')
+    print(f'{"total":8} {sum(times.values()) * 1000:9.1f} ms')
+    if offset is None:
+        print(f'{args.parfile}: round trip is identical ({len(data)} bytes)')
+    else:
+        print(f'{args.parfile}: round trip differs at offset {offset:#x} ({len(data)} bytes in, {len(output)} out)')
+        print(f'  input:  {locate(data, offset)}')
+        print(f'  output: {locate(output, offset)}')
+        return 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,127 @@
+import argparse
+import os
+import os.path
+import sys
+
+
+TEX_MAGIC = b'TEX\x00\x01\x00\x00\x00'
+SINGLE = b'\x88\x88\x00\x00'
+# First header bytes tex2png takes to mean an image has mipmaps
+MIPMAP_FLAGS = (0x06, 0x16, 0x26)
+
+
+def mipmap_chain(pixels, levels=None):
+    """Halve an RGBA array repeatedly with a 2x2 box filter, down to one pixel on the shorter side.
+
+    Each level is computed from the previous one with four strided slices
+    summed in 16 bits, so the whole chain costs a few array operations per
+    level. Odd rows or columns are dropped, matching the w >> 1 sizes the
+    reader expects.
+    """
+    import numpy
+    h, w, _ = pixels.shape
+    if levels is None:
+        levels = min(w, h).bit_length()
+    chain = [pixels]
+    for _ in range(levels - 1):
+        h >>= 1
+        w >>= 1
+        prev = chain[-1][:h * 2, :w * 2].astype(numpy.uint16)
+        level = prev[0::2, 0::2] + prev[1::2, 0::2] + prev[0::2, 1::2] + prev[1::2, 1::2]
+        chain.append(((level + 2) >> 2).astype(numpy.uint8))
+    return chain
+
+def encode_image(pixels, mipmapped=True):
+    """The part of a TEX image after its header: dimensions, mipmap count if any, then raw RGBA levels."""
+    import numpy
+    h, w, _ = pixels.shape
+    if not mipmapped:
+        return [numpy.array([w, h], dtype='<u4').tobytes(), numpy.ascontiguousarray(pixels).data]
+    chain = mipmap_chain(pixels)
+    return [numpy.array([w, h, len(chain)], dtype='<u4').tobytes()] + [numpy.ascontiguousarray(level).data for level in chain]
+
+def encode_tex(images, mipmapped=True, flag=0x06, frames=None):
+    """Encode RGBA arrays of shape (height, width, 4) as a TEX file, in the layouts tex2png reads.
+
+    A single image without frames is written as a plain texture; anything
+    else becomes a multi-texture file, or an 0xc0 set when frames is given
+    (the header then holds len(images) // frames and frames). flag is the
+    first header byte of each image; 0x06, 0x16 and 0x26 mark it as
+    mipmapped, so it is forced to 0 when mipmapped is false.
+    """
+    import numpy
+    if not mipmapped:
+        flag = 0
+    elif flag not in MIPMAP_FLAGS:
+        raise ValueError(f'flag must be one of {", ".join(f"{f:#04x}" for f in MIPMAP_FLAGS)}, not {flag:#x}')
+    header = bytes([flag, 0, 0, 0])
+    if len(images) == 1 and frames is None:
+        return b''.join([TEX_MAGIC, header, SINGLE] + encode_image(images[0], mipmapped))
+    parts = [TEX_MAGIC]
+    if frames:
+        if len(images) % frames:
+            raise ValueError(f'{len(images)} images cannot be split into {frames} frames')
+        parts += [b'\x00\x00\x00\xc0', numpy.array([len(images) // frames, frames], dtype='<u4').tobytes()]
+    else:
+        parts += [b'\x00\x00\x00\x00', numpy.array([len(images)], dtype='<u4').tobytes()]
+    for pixels in images:
+        parts += [TEX_MAGIC, header, SINGLE] + encode_image(pixels, mipmapped)
+    return b''.join(parts)
+
+def load_png(filename):
+    # Pillow and NumPy are only needed once an image is actually read, so importing the package stays cheap
+    import numpy
+    from PIL import Image
+    with Image.open(filename) as img:
+        return numpy.asarray(img.convert('RGBA'))
+
+def convert(src, dst, mipmapped=True, flag=0x06):
+    with open(dst, 'wb') as texfile:
+        texfile.write(encode_tex([load_png(src)], mipmapped, flag))
+    return dst
+
+def find_pngs(paths, recursive=False):
+    for path in paths:
+        if not os.path.isdir(path):
+            yield path
+        elif recursive:
+            for (dirpath, dirnames, filenames) in os.walk(path):
+                dirnames.sort()
+                for filename in sorted(filenames):
+                    if filename.lower().endswith('.png'):
+                        yield os.path.join(dirpath, filename)
+        else:
+            for filename in sorted(os.listdir(path)):
+                if filename.lower().endswith('.png'):
+                    yield os.path.join(path, filename)
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description='Convert PNG images to TEX files. Each PNG becomes a TEX file next to it, unless --atlas is given.')
+    parser.add_argument('paths', nargs='*', default=[os.curdir], help='PNG files, or directories containing them (default: the current directory)')
+    parser.add_argument('-r', '--recursive', action='store_true', help='also convert images in subdirectories')
+    parser.add_argument('-a', '--atlas', metavar='TEX', help='combine all the images, in order, into one multi-texture file')
+    parser.add_argument('--frames', type=int, help='with --atlas, write an 0xc0 set with this many frames')
+    parser.add_argument('--no-mipmaps', dest='mipmapped', action='store_false', help="don't generate mipmaps")
+    parser.add_argument('--flag', type=lambda v: int(v, 0), default=0x06, help='first header byte for mipmapped images: 0x06, 0x16 or 0x26 (default 0x06)')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes (defaults to the CPU count)')
+    args = parser.parse_args(argv)
+    if args.frames is not None and not args.atlas:
+        parser.error('--frames only applies to --atlas')
+    if args.mipmapped and args.flag not in MIPMAP_FLAGS:
+        parser.error(f'--flag must be one of {", ".join(f"{f:#04x}" for f in MIPMAP_FLAGS)}, not {args.flag:#x}')
+
+    pngs = list(find_pngs(args.paths, args.recursive))
+    if args.atlas:
+        with open(args.atlas, 'wb') as texfile:
+            texfile.write(encode_tex([load_png(png) for png in pngs], args.mipmapped, args.flag, args.frames))
+        print(f'Wrote {len(pngs)} images to {args.atlas}')
+    else:
+        from concurrent.futures import ProcessPoolExecutor
+        with ProcessPoolExecutor(args.jobs) as pool:
+            for dst in pool.map(convert, pngs, [png[:-4] + '.tex' for png in pngs], [args.mipmapped] * len(pngs), [args.flag] * len(pngs)):
+                print(dst)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+import argparse
+import sys
+
+from .par2csv import read_par
+
+
+def bits(mask):
+    """Indices of the set bits in mask, lowest first."""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+class ResearchGraph:
+    """The research tree of a PAR file with every transitive relationship worked out up front.
+
+    Research topics are numbered densely in the order given, and the
+    transitive prerequisites and dependents of each are held as integer
+    bitsets over those numbers, so "does X need Y" is a single bit test and
+    combining requirements is a bitwise or. The unlock cost of every
+    research topic is worked out up front too; those of entities, which
+    far outnumber topics, are summed and cached as they are first asked for.
+
+    Problems found while building the graph are kept rather than raised:
+    dangling lists (who, missing research ID) for references to research
+    that doesn't exist, and cyclic lists the indices (cycles the names) of
+    topics that are part of, or depend on, a prerequisite cycle.
+    """
+    def __init__(self, research, entity_groups=()):
+        self.research = list(research)
+        self.index = {r.id: i for (i, r) in enumerate(self.research)}
+        self.by_name = {r.name: i for (i, r) in enumerate(self.research)}
+        self.dangling = []
+
+        self.previous = []
+        for r in self.research:
+            self.previous.append(self.resolve(r.name, r.previous))
+
+        self.entities = dict()
+        for group in entity_groups:
+            for entity in group.entities:
+                mask = 0
+                for i in self.resolve(entity.name, entity.req_research):
+                    mask |= 1 << i
+                self.entities[entity.name] = (group.faction, mask)
+
+        self.order, self.cyclic = self.toposort()
+        self.cycles = [self.research[i].name for i in self.cyclic]
+        self.prereqs = [0] * len(self.research)
+        for i in self.order:
+            mask = 0
+            for p in self.previous[i]:
+                mask |= self.prereqs[p] | (1 << p)
+            self.prereqs[i] = mask
+        # Topics left over by the sort are on or behind a cycle; iterate their closures to a fixed point
+        changed = bool(self.cyclic)
+        while changed:
+            changed = False
+            for i in self.cyclic:
+                mask = self.prereqs[i]
+                for p in self.previous[i]:
+                    mask |= self.prereqs[p] | (1 << p)
+                if mask != self.prereqs[i]:
+                    self.prereqs[i] = mask
+                    changed = True
+
+        self.dependents = [0] * len(self.research)
+        for (i, mask) in enumerate(self.prereqs):
+            for p in bits(mask):
+                self.dependents[p] |= 1 << i
+
+        self.costs = [self.total_cost(mask | (1 << i)) for (i, mask) in enumerate(self.prereqs)]
+        self.cost_cache = dict()
+
+    def resolve(self, who, ids):
+        resolved = []
+        for id in ids:
+            if id in self.index:
+                resolved.append(self.index[id])
+            else:
+                self.dangling.append((who, id))
+        return resolved
+
+    def toposort(self):
+        """Kahn's algorithm over the prerequisite edges. Returns the order and the topics it couldn't place, as indices."""
+        waiting = [len(set(p)) for p in self.previous]
+        unlocks = [[] for _ in self.research]
+        for (i, previous) in enumerate(self.previous):
+            for p in set(previous):
+                unlocks[p].append(i)
+        order = [i for (i, n) in enumerate(waiting) if n == 0]
+        for i in order:
+            for j in unlocks[i]:
+                waiting[j] -= 1
+                if waiting[j] == 0:
+                    order.append(j)
+        placed = set(order)
+        return order, [i for i in range(len(self.research)) if i not in placed]
+
+    def mask(self, name):
+        """Everything that must be researched before name, a research topic or an entity, can be used."""
+        if name in self.by_name:
+            return self.prereqs[self.by_name[name]]
+        faction, direct = self.entities[name]
+        mask = direct
+        for i in bits(direct):
+            mask |= self.prereqs[i]
+        return mask
+
+    def prerequisites(self, name):
+        return [self.research[i] for i in bits(self.mask(name))]
+
+    def dependents_of(self, name):
+        return [self.research[i] for i in bits(self.dependents[self.by_name[name]])]
+
+    def requires(self, name, research_name):
+        return bool(self.mask(name) >> self.by_name[research_name] & 1)
+
+    def unlock_cost(self, name):
+        """Total cost and time of the research needed to use name, including name itself if it is research.
+
+        Returns {faction: (campaign_cost, skirmish_cost, campaign_time, skirmish_time)}
+        summed over the topics of each faction in the closure.
+        """
+        if name in self.by_name:
+            return self.costs[self.by_name[name]]
+        if name not in self.cost_cache:
+            self.cost_cache[name] = self.total_cost(self.mask(name))
+        return self.cost_cache[name]
+
+    def total_cost(self, mask):
+        totals = dict()
+        for i in bits(mask):
+            r = self.research[i]
+            total = totals.get(r.faction, (0, 0, 0, 0))
+            totals[r.faction] = (total[0] + r.campaign_cost, total[1] + r.skirmish_cost, total[2] + r.campaign_time, total[3] + r.skirmish_time)
+        return totals
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description='Check the research tree in a PAR file for cycles and references to missing research, then show what each named research topic or entity needs and what it costs to unlock.')
+    parser.add_argument('parfile', help='the PAR file to read')
+    parser.add_argument('names', nargs='*', metavar='name', help='research topics or entities to look up')
+    args = parser.parse_args(argv)
+
+    entity_groups, research = read_par(args.parfile)
+    graph = ResearchGraph(research, entity_groups)
+    print(f'{len(graph.research)} research topics, {len(graph.entities)} entities')
+    for (who, id) in graph.dangling:
+        print(f'{who}: requires research {id}, which does not exist')
+    if graph.cycles:
+        print(f'Research on or behind a prerequisite cycle: {", ".join(graph.cycles)}')
+    for name in args.names:
+        if name not in graph.by_name and name not in graph.entities:
+            print(f'{name}: no such research or entity')
+            continue
+        print(f'{name} needs: {" ".join(r.name for r in graph.prerequisites(name)) or "nothing"}')
+        for (faction, (campaign_cost, skirmish_cost, campaign_time, skirmish_time)) in sorted(graph.unlock_cost(name).items(), key=lambda item: item[0].value):
+            print(f'  {faction}: campaign cost {campaign_cost}, time {campaign_time}; skirmish cost {skirmish_cost}, time {skirmish_time}')
+        if name in graph.by_name:
+            print(f'  leads to: {" ".join(r.name for r in graph.dependents_of(name)) or "nothing"}')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,385 @@
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import os.path
+import sys
+import zlib
+
+from . import wdfile
+
+
+TEX_MAGIC = b'TEX\x00\x01\x00\x00\x00'
+
+MANIFEST = '.tex2png.json'
+
+
+def read_int(buf, pos):
+    return int.from_bytes(buf[pos:pos + 4], byteorder='little')
+
+def image_layout(buf, pos, header):
+    """Locate one image's mipmaps, starting just after its header.
+
+    Returns the image's canvas size, a list of (offset, w, h, x, y) for each
+    mipmap level and the position after the image. Level 0 goes at the top
+    left with the smaller levels stacked down its right hand side.
+    """
+    w = read_int(buf, pos)
+    h = read_int(buf, pos + 4)
+    pos += 8
+    if header[0] in (0x06, 0x16, 0x26):
+        mipmaps = read_int(buf, pos)
+        pos += 4
+        size = (w + (w >> 1), h)
+    else:
+        mipmaps = 1
+        size = (w, h)
+    levels = []
+    x = 0
+    y = 0
+    for i in range(mipmaps):
+        levels.append((pos, w, h, x, y))
+        pos += w * h * 4
+        if i == 0:
+            x = w
+        else:
+            y += h
+        w >>= 1
+        h >>= 1
+    return size, levels, pos
+
+def tex_layout(buf, filename=''):
+    """Work out where every image in a TEX file lives, without touching pixel data.
+
+    Returns a list of (size, levels) for each sub-texture as described by
+    image_layout(), and the extra multiplier an 0xc0 set applies to its
+    texture count (1 for other files).
+    """
+    if buf[:8] != TEX_MAGIC:
+        raise ValueError(f'{filename}: No magic string in file header')
+    header_a = buf[8:12]
+    d = header_a[3]
+    header_b = buf[12:16]
+    pos = 16
+
+    if header_b == b'\x88\x88\x00\x00':
+        size, levels, pos = image_layout(buf, pos, bytes(header_a) + bytes(header_b))
+        return [(size, levels)], 1
+
+    textures = int.from_bytes(header_b, 'little')
+    frames = 1
+    if d == 0xc0:
+        frames = read_int(buf, pos)
+        textures *= frames
+        pos += 4
+    images = []
+    for i in range(textures):
+        magic = buf[pos:pos + 8]
+        if magic != TEX_MAGIC:
+            raise ValueError(f'{filename}: No magic string in sub header {i} {bytes(magic)}')
+        size, levels, pos = image_layout(buf, pos + 16, buf[pos + 8:pos + 16])
+        images.append((size, levels))
+    return images, frames
+
+def atlas_layout(images):
+    """Place sub-textures side by side. Returns the atlas size and (offset, w, h, x, y) for every mipmap."""
+    placements = []
+    w = 0
+    h = 0
+    for ((img_w, img_h), levels) in images:
+        placements.extend((offset, lw, lh, x + w, y) for (offset, lw, lh, x, y) in levels)
+        w += img_w
+        h = max(h, img_h)
+    return (w, h), placements
+
+def compose(buf, size, placements):
+    """Copy each placement straight from buf, viewed in place, into its spot in a new RGBA array."""
+    import numpy
+    w, h = size
+    out = numpy.zeros((h, w, 4), dtype=numpy.uint8)
+    for (offset, lw, lh, x, y) in placements:
+        out[y:y + lh, x:x + lw] = numpy.frombuffer(buf, dtype=numpy.uint8, count=lw * lh * 4, offset=offset).reshape(lh, lw, 4)
+    return out
+
+def decode_tex(buf, filename=''):
+    """Decode a TEX file held in any buffer into an RGBA array of shape (height, width, 4)."""
+    images, _ = tex_layout(memoryview(buf), filename)
+    return compose(buf, *atlas_layout(images))
+
+
+class TexFile:
+    """A TEX file whose headers are parsed up front but whose pixels are only decoded on request.
+
+    source may be a path, which is memory mapped, or any buffer. Sub-textures
+    are numbered in file order; for 0xc0 sets, frames holds the multiplier
+    applied to the texture count in the header.
+    """
+    def __init__(self, source, filename=''):
+        self.filename = filename
+        self.file = None
+        if isinstance(source, (str, os.PathLike)):
+            self.filename = filename or os.fspath(source)
+            self.file = open(source, 'rb')
+            source = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.buf = source
+        self.images, self.frames = tex_layout(memoryview(source), self.filename)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.close()
+
+    def close(self):
+        if self.file:
+            self.buf.close()
+            self.file.close()
+            self.file = None
+
+    def __len__(self):
+        return len(self.images)
+
+    def __repr__(self):
+        return f'TexFile({self.filename!r}, textures={len(self.images)}, frames={self.frames}, size={self.size(0)})'
+
+    def size(self, index=0, level=0):
+        _, w, h, _, _ = self.images[index][1][level]
+        return w, h
+
+    def levels(self, index=0):
+        return len(self.images[index][1])
+
+    def level(self, index=0, level=0):
+        """One mipmap level of one sub-texture, as an image of its own."""
+        offset, w, h, _, _ = self.images[index][1][level]
+        from PIL import Image
+        return Image.frombytes('RGBA', (w, h), memoryview(self.buf)[offset:offset + w * h * 4])
+
+    def image(self, index=0):
+        """One sub-texture with its mipmaps laid out as tex2png writes them."""
+        from PIL import Image
+        return Image.fromarray(compose(self.buf, *atlas_layout(self.images[index:index + 1])), 'RGBA')
+
+    def decode(self):
+        """The whole file as the side-by-side atlas tex2png writes."""
+        from PIL import Image
+        return Image.fromarray(compose(self.buf, *atlas_layout(self.images)), 'RGBA')
+
+    def thumbnail(self, size, index=0):
+        """The smallest stored mipmap of a sub-texture that is at least size pixels on its longer side.
+
+        No resampling is done, so the result can be up to twice size; if no
+        level is that large, the largest is returned.
+        """
+        levels = self.images[index][1]
+        best = 0
+        for (i, (_, w, h, _, _)) in enumerate(levels):
+            if max(w, h) >= size:
+                best = i
+        return self.level(index, best)
+
+
+def read_tex(filename):
+    with TexFile(filename) as tex:
+        return tex.decode()
+
+def load_tex(source, filename=''):
+    """Decode a TEX file from a path, a buffer or a binary stream into an image."""
+    if isinstance(source, (str, os.PathLike)):
+        return read_tex(source)
+    if hasattr(source, 'read'):
+        source = source.read()
+    from PIL import Image
+    return Image.fromarray(decode_tex(source, filename), 'RGBA')
+
+def read_tex_member(archive, name):
+    """Decode a TEX file held in a WdArchive, straight from the archive's memory map when it is stored uncompressed."""
+    res = archive[name]
+    with archive.getbuffer(res) as data:
+        if res.length == res.decompressed:
+            return load_tex(data, res.name)
+        return load_tex(zlib.decompress(data, bufsize=max(res.decompressed, 1)), res.name)
+
+
+def find_textures(root, recursive=True):
+    if recursive:
+        for (dirpath, dirnames, filenames) in os.walk(root):
+            dirnames.sort()
+            for filename in sorted(filenames):
+                if filename.lower().endswith('.tex'):
+                    yield os.path.relpath(os.path.join(dirpath, filename), root)
+    else:
+        for filename in sorted(os.listdir(root)):
+            if filename.lower().endswith('.tex') and os.path.isfile(os.path.join(root, filename)):
+                yield filename
+
+def file_hash(filename):
+    digest = hashlib.sha1()
+    with open(filename, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def convert(src, dst, known_hash=None, thumbnail=None):
+    """Convert src to a PNG at dst unless its content hash is known_hash. Returns (hash, whether it was converted).
+
+    With thumbnail set, only the first sub-texture's nearest stored mipmap
+    of at least that size is written (see TexFile.thumbnail()).
+    """
+    digest = file_hash(src)
+    if digest == known_hash and os.path.exists(dst):
+        return digest, False
+    os.makedirs(os.path.dirname(dst) or os.curdir, exist_ok=True)
+    with TexFile(src) as tex:
+        img = tex.thumbnail(thumbnail) if thumbnail else tex.decode()
+    img.save(dst)
+    return digest, True
+
+def convert_tree(root=os.curdir, outdir=None, recursive=True, workers=None, force=False, verbose=False, thumbnail=None):
+    """Convert every TEX file under root to PNG on a process pool, skipping ones that haven't changed since the last run.
+
+    PNGs are written to the same relative path under outdir (by default
+    next to the textures). A manifest in outdir records each texture's
+    size, mtime and content hash: files whose size and mtime are unchanged
+    are skipped outright, and files that were only touched are hashed and
+    skipped if their content is the same. Returns (converted, skipped).
+
+    Entries are keyed by the texture's path relative to outdir, so several
+    roots can share one outdir and manifest: only this root's entries are
+    replaced when the manifest is written.
+    """
+    outdir = outdir or root
+    manifest_path = os.path.join(outdir, MANIFEST)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        manifest = dict()
+    try:
+        prefix = os.path.relpath(root, outdir)
+    except ValueError:
+        # On another drive from outdir
+        prefix = os.path.abspath(root)
+    if prefix == os.curdir:
+        owned = lambda key: key != os.pardir and not key.startswith(os.pardir + os.sep)
+    else:
+        owned = lambda key: key.startswith(prefix + os.sep)
+
+    updated = dict()
+    jobs = dict()
+    for rel in find_textures(root, recursive):
+        src = os.path.join(root, rel)
+        dst = os.path.join(outdir, rel[:-4] + '.png')
+        key = os.path.normpath(os.path.join(prefix, rel))
+        stat = os.stat(src)
+        known = None if force else manifest.get(key)
+        if known and known.get('thumbnail') != thumbnail:
+            known = None
+        if known and known['size'] == stat.st_size and known['mtime'] == stat.st_mtime_ns and os.path.exists(dst):
+            updated[key] = known
+        else:
+            jobs[key] = (src, dst, known and known['hash'], stat)
+
+    from concurrent.futures import ProcessPoolExecutor
+    converted = 0
+    try:
+        with ProcessPoolExecutor(workers) as pool:
+            futures = {key: pool.submit(convert, src, dst, known_hash, thumbnail) for (key, (src, dst, known_hash, _)) in jobs.items()}
+            for (key, future) in futures.items():
+                digest, was_converted = future.result()
+                stat = jobs[key][3]
+                updated[key] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': digest, 'thumbnail': thumbnail}
+                if was_converted:
+                    converted += 1
+                    if verbose:
+                        print(os.path.relpath(jobs[key][0], root))
+    finally:
+        merged = {key: entry for (key, entry) in manifest.items() if not owned(key)}
+        merged.update(updated)
+        os.makedirs(outdir, exist_ok=True)
+        with open(manifest_path + '.tmp', 'w') as f:
+            json.dump(merged, f, indent=0, sort_keys=True)
+        os.replace(manifest_path + '.tmp', manifest_path)
+    return converted, len(updated) - converted
+
+
+open_archives = dict()
+
+def convert_member(archive_path, name, dst):
+    # Archives stay open for the life of the worker process so each is only mapped and indexed once
+    if archive_path not in open_archives:
+        open_archives[archive_path] = wdfile.WdArchive(archive_path)
+    os.makedirs(os.path.dirname(dst) or os.curdir, exist_ok=True)
+    read_tex_member(open_archives[archive_path], name).save(dst)
+
+def convert_archives(archives, outdir=os.curdir, patterns=None, workers=None, verbose=False):
+    """Convert the TEX files in a set of WD archives to PNGs under outdir, without extracting them first.
+
+    Where archives contain the same texture, the later one wins as in
+    wdfile.WdFileSystem. patterns optionally narrows the selection with
+    wdfile.Query globs. Returns the number of textures converted.
+    """
+    query = wdfile.Query(patterns or ['*.tex'], where=lambda res: res.name.lower().endswith('.tex'))
+    with wdfile.WdFileSystem(archives) as fs:
+        jobs = [(entry.source.filename, entry.name, wdfile.outputpath(entry.resource, outdir)[:-4] + '.png') for entry in fs if query.matches(entry.resource)]
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(convert_member, *job) for job in jobs]
+        for (job, future) in zip(jobs, futures):
+            future.result()
+            if verbose:
+                print(job[1])
+    return len(jobs)
+
+
+def istexfile(filename):
+    try:
+        with open(filename, 'rb') as f:
+            return f.read(len(TEX_MAGIC)) == TEX_MAGIC
+    except OSError:
+        return False
+
+
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description='Convert TEX files to PNG images.')
+    parser.add_argument('paths', nargs='*', default=[os.curdir], help='TEX files, directories containing them, or WD archives to convert textures from (default: the current directory)')
+    parser.add_argument('-r', '--recursive', action='store_true', help='also convert textures in subdirectories')
+    parser.add_argument('-o', '--output', help='directory to write PNGs to, mirroring the input tree (default: next to each texture)')
+    parser.add_argument('-j', '--jobs', type=int, default=None, help='number of worker processes (defaults to the CPU count)')
+    parser.add_argument('-p', '--pattern', action='append', help='only convert textures in WD archives whose path matches this glob (may be repeated)')
+    parser.add_argument('-t', '--thumbnail', type=int, metavar='SIZE', help='write a quick preview instead: the smallest stored mipmap at least SIZE pixels across')
+    parser.add_argument('-f', '--force', action='store_true', help=f'convert every texture, ignoring the {MANIFEST} manifest')
+    args = parser.parse_args(argv)
+
+    textures = []
+    archives = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            continue
+        if not os.path.exists(path):
+            parser.error(f'{path}: no such file or directory')
+        if istexfile(path):
+            textures.append(path)
+        elif wdfile.iswdfile(path):
+            archives.append(path)
+        else:
+            parser.error(f'{path}: not a TEX file, WD archive or directory')
+
+    for src in textures:
+        dst = os.path.join(args.output or os.path.dirname(src), os.path.splitext(os.path.basename(src))[0] + '.png')
+        convert(src, dst, thumbnail=args.thumbnail)
+        print(src)
+    if textures:
+        print(f'Converted {len(textures)} textures')
+    if archives:
+        converted = convert_archives(archives, args.output or os.curdir, args.pattern, args.jobs, verbose=True)
+        print(f'Converted {converted} textures from {len(archives)} archives')
+    for root in args.paths:
+        if os.path.isdir(root):
+            converted, skipped = convert_tree(root, args.output, args.recursive, args.jobs, args.force, verbose=True, thumbnail=args.thumbnail)
+            print(f'Converted {converted} textures, {skipped} unchanged')
+
+
+if __name__ == '__main__':
+    sys.exit(main())
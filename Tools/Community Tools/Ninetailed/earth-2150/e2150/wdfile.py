@@ -0,0 +1,889 @@
+from collections import deque
+from array import array
+from io import BufferedReader, BytesIO, RawIOBase, SEEK_CUR, SEEK_END, SEEK_SET
+import argparse
+import fnmatch
+import hashlib
+import mmap
+import os
+import os.path
+import re
+import struct
+import sys
+import weakref
+import zlib
+
+
+CHUNK_SIZE = 1 << 20
+
+WD_MAGIC = b'\xff\xa1\xd01WD\x00\x02'
+
+CACHE_DIR = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.expanduser('~/.cache'), 'earth-2150', 'wdindex')
+
+
+class Resource:
+	__slots__ = ('name', 'filetype', 'offset', 'length', 'decompressed', 'supplementary_data')
+
+	def __init__(self):
+		self.name = ''
+		self.filetype = 0
+		self.offset = 0
+		self.length = 0
+		self.decompressed = 0
+		self.supplementary_data = None
+
+	def __repr__(self):
+		return f'Resource(name=\'{self.name}\', type={self.filetype}, offset={self.offset}, length={self.length}, decompressed={self.decompressed}, supplementary_data={self.supplementary_data})'
+
+
+def readint(stream, bytecount=4):
+	return int.from_bytes(stream.read(bytecount), byteorder='little')
+
+def readname(stream):
+	namelen = stream.read(1)
+	if len(namelen) == 0: return None
+	namedata = stream.read(namelen[0])
+	try:
+		return namedata.decode(encoding='latin_1')
+	except:
+		print(namedata)
+		raise
+
+def readsupplementary(filetype, stream):
+	if filetype == 9:
+		return readname(stream)
+	elif filetype == 17:
+		return stream.read(4)
+	elif filetype == 30:
+		return readname(stream)
+	elif filetype == 33:
+		return stream.read(16)
+	elif filetype == 43:
+		return (readname(stream), stream.read(16))
+	elif filetype == 49:
+		return stream.read(20)
+	elif filetype == 57:
+		return (readname(stream), stream.read(20))
+	elif filetype == 59:
+		return (readname(stream), stream.read(20))
+	else:
+		return None
+
+def readdirectory(dirraw):
+	dirdata = BytesIO(dirraw)
+
+	files = []
+
+	dirdata.seek(10)
+	while True:
+		name = readname(dirdata)
+		if name is None: break
+		res = Resource()
+		res.name = name
+		res.filetype = dirdata.read(1)[0]
+		if res.filetype == 255:
+			res.supplementary_data = dirdata.read(3)
+		else:
+			res.offset = readint(dirdata)
+			res.length = readint(dirdata)
+			res.decompressed = readint(dirdata)
+			res.supplementary_data = readsupplementary(res.filetype, dirdata)
+		files.append(res)
+
+	return files
+
+def readindex(filename):
+	with open(filename, 'rb') as wdfile:
+		wdfile.seek(-4, SEEK_END)
+		dirlen = readint(wdfile)
+		wdfile.seek(-dirlen, SEEK_END)
+		dirraw = zlib.decompress(wdfile.read())
+
+	return readdirectory(dirraw)
+
+def iswdfile(filename):
+	"""Whether filename is a WD archive, going by the magic at the start of its compressed directory."""
+	try:
+		with open(filename, 'rb') as wdfile:
+			size = wdfile.seek(0, SEEK_END)
+			if size < 4:
+				return False
+			wdfile.seek(-4, SEEK_END)
+			dirlen = readint(wdfile)
+			if not 4 < dirlen <= size:
+				return False
+			wdfile.seek(-dirlen, SEEK_END)
+			return zlib.decompressobj().decompress(wdfile.read(dirlen - 4), len(WD_MAGIC)) == WD_MAGIC
+	except (OSError, zlib.error):
+		return False
+
+def writename(stream, name):
+	namedata = name.encode(encoding='latin_1')
+	if len(namedata) > 255:
+		raise ValueError(f'Name too long for a WD directory: {name}')
+	stream.write(bytes([len(namedata)]))
+	stream.write(namedata)
+
+def writedirectory(resources):
+	dirdata = BytesIO()
+	# The last two header bytes aren't understood; zero is accepted
+	dirdata.write(WD_MAGIC + b'\x00\x00')
+	for res in resources:
+		writename(dirdata, res.name)
+		dirdata.write(bytes([res.filetype]))
+		if res.filetype == 255:
+			dirdata.write(res.supplementary_data)
+			continue
+		dirdata.write(struct.pack('<III', res.offset, res.length, res.decompressed))
+		name, data = splitsupplementary(res.filetype, res.supplementary_data)
+		if supplementary_layout.get(res.filetype, (False, 0))[0]:
+			writename(dirdata, name)
+		dirdata.write(data)
+	return dirdata.getvalue()
+
+# Which supplementary fields each filetype carries, as (has name, byte count)
+supplementary_layout = {
+	9: (True, 0),
+	17: (False, 4),
+	30: (True, 0),
+	33: (False, 16),
+	43: (True, 16),
+	49: (False, 20),
+	57: (True, 20),
+	59: (True, 20),
+	255: (False, 3),
+}
+
+def splitsupplementary(filetype, data):
+	hasname, bytecount = supplementary_layout.get(filetype, (False, 0))
+	if hasname and bytecount:
+		return data
+	elif hasname:
+		return (data, b'')
+	elif bytecount:
+		return ('', data)
+	else:
+		return ('', b'')
+
+def joinsupplementary(filetype, name, data):
+	hasname, bytecount = supplementary_layout.get(filetype, (False, 0))
+	if hasname and bytecount:
+		return (name, data)
+	elif hasname:
+		return name
+	elif bytecount:
+		return data
+	else:
+		return None
+
+
+INDEX_MAGIC = b'WDIX\x01\x00\x00\x00'
+index_header = struct.Struct('<8sQqI')
+
+def packcolumn(typecode, values):
+	column = array(typecode, values)
+	if sys.byteorder == 'big':
+		column.byteswap()
+	return column.tobytes()
+
+def unpackcolumn(typecode, data, pos, count):
+	column = array(typecode)
+	end = pos + count * column.itemsize
+	column.frombytes(data[pos:end])
+	if len(column) != count:
+		raise ValueError(f'Index column at {pos} is truncated')
+	if sys.byteorder == 'big':
+		column.byteswap()
+	return column, end
+
+def packindex(resources, size, mtime):
+	"""Serialise a parsed directory column by column, tagged with the archive size and mtime it came from."""
+	names = [res.name.encode('latin_1') for res in resources]
+	supplementary = [splitsupplementary(res.filetype, res.supplementary_data) for res in resources]
+	suppnames = [name.encode('latin_1') for (name, _) in supplementary]
+	suppdata = [data for (_, data) in supplementary]
+	return b''.join([
+		index_header.pack(INDEX_MAGIC, size, mtime, len(resources)),
+		packcolumn('B', (res.filetype for res in resources)),
+		packcolumn('I', (res.offset for res in resources)),
+		packcolumn('I', (res.length for res in resources)),
+		packcolumn('I', (res.decompressed for res in resources)),
+		packcolumn('B', map(len, names)),
+		packcolumn('B', map(len, suppnames)),
+		packcolumn('B', map(len, suppdata)),
+		*names, *suppnames, *suppdata,
+	])
+
+def unpackindex(data, size, mtime):
+	"""Rebuild a directory from packindex() output, or return None if it is stale or unreadable."""
+	try:
+		magic, cachedsize, cachedmtime, count = index_header.unpack_from(data)
+	except struct.error:
+		return None
+	if magic != INDEX_MAGIC or cachedsize != size or cachedmtime != mtime:
+		return None
+	try:
+		return readpackedindex(data, index_header.size, count)
+	except (ValueError, IndexError):
+		# Truncated or corrupt; cachedindex() rebuilds it from the archive
+		return None
+
+def readpackedindex(data, pos, count):
+	filetypes, pos = unpackcolumn('B', data, pos, count)
+	offsets, pos = unpackcolumn('I', data, pos, count)
+	lengths, pos = unpackcolumn('I', data, pos, count)
+	decompressed, pos = unpackcolumn('I', data, pos, count)
+	namelens, pos = unpackcolumn('B', data, pos, count)
+	suppnamelens, pos = unpackcolumn('B', data, pos, count)
+	suppdatalens, pos = unpackcolumn('B', data, pos, count)
+
+	def strings(lengths, pos):
+		values = []
+		for length in lengths:
+			values.append(data[pos:pos + length])
+			pos += length
+		return values, pos
+
+	names, pos = strings(namelens, pos)
+	suppnames, pos = strings(suppnamelens, pos)
+	suppdata, pos = strings(suppdatalens, pos)
+	if pos != len(data):
+		raise ValueError(f'Index is {len(data)} bytes, expected {pos}')
+
+	resources = []
+	for i in range(count):
+		res = Resource()
+		res.name = names[i].decode('latin_1')
+		res.filetype = filetypes[i]
+		res.offset = offsets[i]
+		res.length = lengths[i]
+		res.decompressed = decompressed[i]
+		res.supplementary_data = joinsupplementary(res.filetype, suppnames[i].decode('latin_1'), suppdata[i])
+		resources.append(res)
+	return resources
+
+def cachedindex(filename, cachedir=CACHE_DIR):
+	"""readindex(), but reusing the result from a previous run while the archive's size and mtime are unchanged.
+
+	The cache is only an optimisation: if it can't be read or written the
+	directory is simply parsed from the archive.
+	"""
+	path = os.path.abspath(filename)
+	stat = os.stat(path)
+	cachefile = os.path.join(cachedir, hashlib.sha1(os.fsencode(path)).hexdigest() + '.idx')
+	try:
+		with open(cachefile, 'rb') as f:
+			resources = unpackindex(f.read(), stat.st_size, stat.st_mtime_ns)
+		if resources is not None:
+			return resources
+	except OSError:
+		pass
+
+	resources = readindex(path)
+	tmpfile = f'{cachefile}.{os.getpid()}.tmp'
+	try:
+		os.makedirs(cachedir, exist_ok=True)
+		with open(tmpfile, 'wb') as f:
+			f.write(packindex(resources, stat.st_size, stat.st_mtime_ns))
+		os.replace(tmpfile, cachefile)
+	except OSError:
+		try:
+			os.remove(tmpfile)
+		except OSError:
+			pass
+	return resources
+
+def normname(name):
+	return name.replace('/', '\\')
+
+
+class MemberReader(RawIOBase):
+	"""Read-only stream over a stored (uncompressed) member, backed directly by the archive's memory map."""
+	def __init__(self, view):
+		self.view = view
+		self.pos = 0
+
+	def readable(self):
+		return True
+
+	def seekable(self):
+		return True
+
+	def getbuffer(self):
+		return self.view
+
+	def readinto(self, buffer):
+		data = self.view[self.pos:self.pos + len(buffer)]
+		buffer[:len(data)] = data
+		self.pos += len(data)
+		return len(data)
+
+	def read(self, size=-1):
+		if size is None or size < 0:
+			end = len(self.view)
+		else:
+			end = min(self.pos + size, len(self.view))
+		data = bytes(self.view[self.pos:end])
+		self.pos = max(self.pos, end)
+		return data
+
+	readall = read
+
+	def seek(self, offset, whence=SEEK_SET):
+		if whence == SEEK_CUR:
+			offset += self.pos
+		elif whence == SEEK_END:
+			offset += len(self.view)
+		if offset < 0:
+			raise ValueError(f'negative seek position {offset}')
+		self.pos = offset
+		return self.pos
+
+	def tell(self):
+		return self.pos
+
+	def close(self):
+		if not self.closed:
+			self.view.release()
+		super().close()
+
+
+class DecompressingReader(RawIOBase):
+	"""Read-only stream that inflates a compressed member on demand as it is read."""
+	def __init__(self, view, decompressed):
+		self.view = view
+		self.decompressed = decompressed
+		self.rewind()
+
+	def rewind(self):
+		self.decompressor = zlib.decompressobj()
+		self.inpos = 0
+		self.pos = 0
+
+	def readable(self):
+		return True
+
+	def seekable(self):
+		return True
+
+	def readinto(self, buffer):
+		size = len(buffer)
+		data = b''
+		while not data and size and not self.decompressor.eof:
+			if self.decompressor.unconsumed_tail:
+				data = self.decompressor.decompress(self.decompressor.unconsumed_tail, size)
+			elif self.inpos < len(self.view):
+				chunk = self.view[self.inpos:self.inpos + CHUNK_SIZE]
+				self.inpos += len(chunk)
+				data = self.decompressor.decompress(chunk, size)
+			else:
+				raise EOFError('compressed member is truncated')
+		buffer[:len(data)] = data
+		self.pos += len(data)
+		return len(data)
+
+	def seek(self, offset, whence=SEEK_SET):
+		if whence == SEEK_CUR:
+			offset += self.pos
+		elif whence == SEEK_END:
+			offset += self.decompressed
+		if offset < 0:
+			raise ValueError(f'negative seek position {offset}')
+		if offset < self.pos:
+			self.rewind()
+		skip = bytearray(65536)
+		while self.pos < offset:
+			if not self.readinto(memoryview(skip)[:offset - self.pos]): break
+		return self.pos
+
+	def tell(self):
+		return self.pos
+
+	def close(self):
+		if not self.closed:
+			self.view.release()
+		super().close()
+
+
+class WdArchive:
+	"""Random access to the members of a single WD file without extracting it.
+
+	The archive is memory mapped once and its directory indexed by name, so
+	looking up and reading a member only touches that member's bytes.
+	Member names use the archive's backslash separators, but forward slashes
+	are accepted too. If cachedir is given the parsed directory is kept
+	there between runs (see cachedindex()).
+
+	Member streams from open() and views from getbuffer() read straight
+	from the map, so they are only usable while the archive is open:
+	close() releases them. If something else still holds a buffer taken
+	from one (a NumPy array, say), the map itself is left to be unmapped
+	once the last of those is gone.
+	"""
+	def __init__(self, filename, cachedir=None):
+		self.filename = filename
+		with open(filename, 'rb') as wdfile:
+			self.map = mmap.mmap(wdfile.fileno(), 0, access=mmap.ACCESS_READ)
+		self.views = {}
+		if cachedir:
+			self.resources = cachedindex(filename, cachedir)
+		else:
+			dirlen = int.from_bytes(self.map[-4:], byteorder='little')
+			self.resources = readdirectory(zlib.decompress(self.map[-dirlen:]))
+		self.index = {res.name: res for res in self.resources}
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, type, value, traceback):
+		self.close()
+
+	def close(self):
+		if self.map is None:
+			return
+		for ref in list(self.views.values()):
+			view = ref()
+			if view is None:
+				continue
+			try:
+				view.release()
+			except BufferError:
+				pass
+		try:
+			self.map.close()
+		except BufferError:
+			pass
+		self.views.clear()
+		self.map = None
+
+	def __len__(self):
+		return len(self.resources)
+
+	def __iter__(self):
+		return iter(self.resources)
+
+	def __contains__(self, name):
+		return normname(name) in self.index
+
+	def __getitem__(self, name):
+		return self.index[normname(name)]
+
+	def __repr__(self):
+		return f'WdArchive({self.filename!r}, resources={len(self.resources)})'
+
+	def getbuffer(self, res):
+		"""Zero-copy view of a member's bytes exactly as stored in the archive, valid until the archive is closed."""
+		view = memoryview(self.map)[res.offset:res.offset + res.length]
+		# Memoryviews hash by content, so they are tracked by identity; the entry goes when the view does
+		key = id(view)
+		views = self.views
+		views[key] = weakref.ref(view, lambda _, key=key: views.pop(key, None))
+		return view
+
+	def open(self, name):
+		res = self[name]
+		if res.filetype == 255:
+			raise IsADirectoryError(res.name)
+		if res.length == res.decompressed:
+			return MemberReader(self.getbuffer(res))
+		return BufferedReader(DecompressingReader(self.getbuffer(res), res.decompressed))
+
+	def read(self, name):
+		with self.open(name) as member:
+			return member.read()
+
+
+def findarchives(paths):
+	for path in paths:
+		if os.path.isdir(path):
+			for entry in sorted(os.scandir(path), key=lambda e: e.name.lower()):
+				if entry.is_file() and entry.name.lower().endswith('.wd'):
+					yield entry.path
+		else:
+			yield path
+
+class Query:
+	"""Selects directory entries before any member data is read.
+
+	An entry matches if its name matches any of the glob patterns (case
+	insensitive, either slash direction), its filetype is one of filetypes,
+	its decompressed size falls within minsize..maxsize, the name in its
+	supplementary data matches suppname, and where(res) is true. Criteria
+	left as None aren't checked. Groups never match.
+	"""
+	def __init__(self, patterns=None, filetypes=None, minsize=None, maxsize=None, suppname=None, where=None):
+		self.patterns = re.compile('|'.join(fnmatch.translate(lookupkey(p)) for p in patterns)) if patterns else None
+		self.filetypes = set(filetypes) if filetypes else None
+		self.minsize = minsize
+		self.maxsize = maxsize
+		self.suppname = re.compile(fnmatch.translate(suppname.lower())) if suppname else None
+		self.where = where
+
+	def matches(self, res):
+		if res.filetype == 255:
+			return False
+		if self.patterns is not None and not self.patterns.match(res.name.lower()):
+			return False
+		if self.filetypes is not None and res.filetype not in self.filetypes:
+			return False
+		if self.minsize is not None and res.decompressed < self.minsize:
+			return False
+		if self.maxsize is not None and res.decompressed > self.maxsize:
+			return False
+		if self.suppname is not None:
+			name, _ = splitsupplementary(res.filetype, res.supplementary_data)
+			if not supplementary_layout.get(res.filetype, (False, 0))[0] or not self.suppname.match(name.lower()):
+				return False
+		if self.where is not None and not self.where(res):
+			return False
+		return True
+
+	def select(self, resources):
+		"""Matching entries, in the order they are stored in the archive."""
+		return sorted(filter(self.matches, resources), key=lambda res: res.offset)
+
+
+def lookupkey(name):
+	return normname(name).strip('\\').lower()
+
+
+class FileEntry:
+	__slots__ = ('name', 'size', 'source', 'resource')
+
+	def __init__(self, name, size, source, resource=None):
+		self.name = name
+		self.size = size
+		self.source = source
+		self.resource = resource
+
+	def __repr__(self):
+		return f'FileEntry(name={self.name!r}, size={self.size}, source={self.source!r})'
+
+
+class WdFileSystem:
+	"""A single read-only view over several WD archives and, optionally, a directory of loose files.
+
+	Archives are given lowest priority first, so a file in a later archive
+	hides the same file in an earlier one, and loose files hide them all,
+	the same way the game resolves its data. Paths are matched without
+	regard to case or slash direction. Everything is resolved when the
+	file system is created; lookups afterwards are a single dict access.
+	"""
+	def __init__(self, archives, loosedir=None, cachedir=None):
+		self.archives = []
+		self.files = dict()
+		self.dirs = {'': dict()}
+		try:
+			for filename in findarchives(archives):
+				archive = WdArchive(filename, cachedir)
+				self.archives.append(archive)
+				for res in archive:
+					if res.filetype != 255:
+						self.register(FileEntry(res.name, res.decompressed, archive, res))
+		except:
+			self.close()
+			raise
+		self.loosedir = loosedir
+		if loosedir:
+			for (dirpath, _, filenames) in os.walk(loosedir):
+				for filename in filenames:
+					path = os.path.join(dirpath, filename)
+					name = os.path.relpath(path, loosedir).replace(os.sep, '\\')
+					self.register(FileEntry(name, os.path.getsize(path), path))
+
+	def register(self, entry):
+		key = lookupkey(entry.name)
+		self.files[key] = entry
+		parts = entry.name.split('\\')
+		parent = ''
+		for part in parts[:-1]:
+			self.dirs[parent].setdefault(part.lower(), part)
+			parent = f'{parent}\\{part.lower()}' if parent else part.lower()
+			self.dirs.setdefault(parent, dict())
+		self.dirs[parent].setdefault(parts[-1].lower(), parts[-1])
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, type, value, traceback):
+		self.close()
+
+	def close(self):
+		for archive in self.archives:
+			archive.close()
+		self.archives = []
+
+	def __contains__(self, path):
+		return self.exists(path)
+
+	def __iter__(self):
+		return iter(self.files.values())
+
+	def __len__(self):
+		return len(self.files)
+
+	def exists(self, path):
+		key = lookupkey(path)
+		return key in self.files or key in self.dirs
+
+	def isdir(self, path):
+		return lookupkey(path) in self.dirs
+
+	def stat(self, path):
+		try:
+			return self.files[lookupkey(path)]
+		except KeyError:
+			raise FileNotFoundError(path) from None
+
+	def open(self, path):
+		entry = self.stat(path)
+		if entry.resource is None:
+			return open(entry.source, 'rb')
+		return entry.source.open(entry.resource.name)
+
+	def read(self, path):
+		with self.open(path) as f:
+			return f.read()
+
+	def listdir(self, path=''):
+		try:
+			return sorted(self.dirs[lookupkey(path)].values(), key=str.lower)
+		except KeyError:
+			raise FileNotFoundError(path) from None
+
+
+def outputpath(res, outdir):
+	return os.path.join(outdir, *res.name.split('\\'))
+
+def copymember(res, data, outfile, chunksize=CHUNK_SIZE):
+	"""Write a member to outfile from its stored bytes, a window at a time.
+
+	Neither the compressed input nor the inflated output is ever held in
+	memory by more than chunksize bytes, however large the member is.
+	"""
+	written = 0
+	if res.length == res.decompressed:
+		for pos in range(0, len(data), chunksize):
+			block = data[pos:pos + chunksize]
+			outfile.write(block)
+			written += len(block)
+	else:
+		decompress = zlib.decompressobj()
+		pos = 0
+		while not decompress.eof:
+			if decompress.unconsumed_tail:
+				chunk = decompress.unconsumed_tail
+			elif pos < len(data):
+				chunk = data[pos:pos + chunksize]
+				pos += len(chunk)
+			else:
+				break
+			block = decompress.decompress(chunk, chunksize)
+			outfile.write(block)
+			written += len(block)
+	if written != res.decompressed:
+		raise ValueError(f'{res.name}: expected {res.decompressed} bytes but got {written}')
+	return written
+
+def extractmember(archive, res, outdir):
+	path = outputpath(res, outdir)
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+	with open(path, 'wb') as outfile, archive.getbuffer(res) as data:
+		copymember(res, data, outfile)
+	return res
+
+def extractall(filenames, outdir=os.curdir, workers=None, verbose=False, cachedir=None, query=None):
+	"""Extract every member of the given archives, or those selected by query, into outdir using a pool of worker threads.
+
+	zlib and file I/O release the GIL, so threads scale across cores here.
+	Where several archives contain the same file, the one listed last wins,
+	matching how the game resolves them; that choice is made before any
+	work is dispatched so the result doesn't depend on scheduling. Members
+	are read archive by archive in offset order to keep disk access
+	sequential.
+	"""
+	query = query or Query()
+	archives = []
+	try:
+		jobs = dict()
+		for filename in filenames:
+			archive = WdArchive(filename, cachedir)
+			archives.append(archive)
+			for res in query.select(archive):
+				jobs[os.path.normcase(outputpath(res, outdir))] = (len(archives), res.offset, archive, res)
+
+		from concurrent.futures import ThreadPoolExecutor
+		with ThreadPoolExecutor(workers) as pool:
+			for res in pool.map(lambda job: extractmember(job[2], job[3], outdir), sorted(jobs.values(), key=lambda job: job[:2])):
+				if verbose:
+					print(res.name)
+		return len(jobs)
+	finally:
+		for archive in archives:
+			archive.close()
+
+
+def ordered(pool, fn, items, window):
+	"""Like pool.map, but with at most window calls in flight so results don't pile up in memory."""
+	pending = deque()
+	for item in items:
+		pending.append(pool.submit(fn, item))
+		if len(pending) >= window:
+			yield pending.popleft().result()
+	while pending:
+		yield pending.popleft().result()
+
+def compressmember(data, level):
+	"""Return the bytes to store for a member: zlib compressed, or as-is if that doesn't make it smaller."""
+	compressed = zlib.compress(data, level)
+	if len(compressed) < len(data):
+		return compressed
+	return data
+
+
+class WdWriter:
+	"""Builds a WD file in the layout readindex() parses.
+
+	Members are queued with add(), addfile() or copy() and written out on
+	close(), in the order they were added. New data is compressed on a pool
+	of worker threads and kept raw where compression doesn't pay. Members
+	copied from another WdArchive keep their stored bytes verbatim, so that
+	archive must stay open until the writer is closed.
+	"""
+	def __init__(self, filename, workers=None, level=9):
+		self.filename = filename
+		self.workers = workers or os.cpu_count() or 1
+		self.level = level
+		self.entries = []
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, type, value, traceback):
+		if type is None:
+			self.close()
+
+	def entry(self, name, filetype, supplementary_data):
+		res = Resource()
+		res.name = normname(name)
+		res.filetype = filetype
+		res.offset = res.length = res.decompressed = 0
+		res.supplementary_data = supplementary_data
+		return res
+
+	def add(self, name, data, filetype=1, supplementary_data=None):
+		self.entries.append((self.entry(name, filetype, supplementary_data), lambda: data, None))
+
+	def addfile(self, name, path, filetype=1, supplementary_data=None):
+		def load():
+			with open(path, 'rb') as f:
+				return f.read()
+		self.entries.append((self.entry(name, filetype, supplementary_data), load, None))
+
+	def copy(self, archive, res):
+		self.entries.append((self.entry(res.name, res.filetype, res.supplementary_data), None, (archive, res)))
+
+	def encode(self, entry):
+		res, load, source = entry
+		if res.filetype == 255:
+			return res, b'', 0
+		if source is not None:
+			archive, original = source
+			return res, archive.getbuffer(original), original.decompressed
+		data = load()
+		return res, compressmember(data, self.level), len(data)
+
+	def close(self):
+		from concurrent.futures import ThreadPoolExecutor
+		resources = []
+		with open(self.filename, 'wb') as wdfile, ThreadPoolExecutor(self.workers) as pool:
+			wdfile.write(zlib.compress(WD_MAGIC + b'\x00\x00'))
+			for (res, stored, decompressed) in ordered(pool, self.encode, self.entries, self.workers * 2):
+				if res.filetype != 255:
+					res.offset = wdfile.tell()
+					res.length = len(stored)
+					res.decompressed = decompressed
+					wdfile.write(stored)
+					if isinstance(stored, memoryview):
+						stored.release()
+				resources.append(res)
+			dirraw = zlib.compress(writedirectory(resources), self.level)
+			wdfile.write(dirraw)
+			wdfile.write(struct.pack('<I', len(dirraw) + 4))
+		self.entries = []
+		return resources
+
+
+def repack(source, target, replacements=None, removals=(), workers=None, level=9):
+	"""Write a copy of the source archive to target with some members replaced, added or removed.
+
+	replacements maps member names to new contents, as bytes or a path to
+	read them from. Every other member is copied without recompressing it.
+	source and target may be the same file.
+	"""
+	replacements = replacements or {}
+	replacements = {normname(name): data for (name, data) in replacements.items()}
+	removals = {normname(name) for name in removals}
+	tmpfile = f'{target}.{os.getpid()}.tmp'
+	try:
+		with WdArchive(source) as archive:
+			writer = WdWriter(tmpfile, workers, level)
+			for res in archive:
+				if res.name in removals: continue
+				data = replacements.pop(res.name, None)
+				if data is None:
+					writer.copy(archive, res)
+				elif isinstance(data, bytes):
+					writer.add(res.name, data, res.filetype, res.supplementary_data)
+				else:
+					writer.addfile(res.name, data, res.filetype, res.supplementary_data)
+			for (name, data) in replacements.items():
+				if isinstance(data, bytes):
+					writer.add(name, data)
+				else:
+					writer.addfile(name, data)
+			resources = writer.close()
+		os.replace(tmpfile, target)
+	finally:
+		if os.path.exists(tmpfile):
+			os.remove(tmpfile)
+	return resources
+
+
+def main(argv=None, prog=None):
+	parser = argparse.ArgumentParser(prog=prog, description='Extract the contents of WD archives.')
+	parser.add_argument('paths', nargs='*', default=['C:/Games/Earth 2150 - The Moon Project/WDFiles'], help='WD files, or directories to search for them')
+	parser.add_argument('-o', '--output', help='directory to extract into (defaults to the directory of each archive)')
+	parser.add_argument('-j', '--jobs', type=int, default=None, help='number of worker threads (defaults to the CPU count)')
+	parser.add_argument('-l', '--list', action='store_true', help='list archive contents instead of extracting them')
+	parser.add_argument('-p', '--pattern', action='append', help='only files whose path matches this glob, e.g. "Textures\\*.tex" (may be repeated)')
+	parser.add_argument('-t', '--type', action='append', type=int, help='only files of this filetype (may be repeated)')
+	parser.add_argument('--min-size', type=int, help='only files at least this many bytes long')
+	parser.add_argument('--max-size', type=int, help='only files at most this many bytes long')
+	parser.add_argument('--supplementary', help='only files whose supplementary name matches this glob')
+	parser.add_argument('--no-cache', dest='cachedir', action='store_const', const=None, default=CACHE_DIR, help=f'don\'t keep parsed directories in {CACHE_DIR}')
+	args = parser.parse_args(argv)
+
+	query = Query(args.pattern, args.type, args.min_size, args.max_size, args.supplementary)
+	filenames = list(findarchives(args.paths))
+	if args.list:
+		for filename in filenames:
+			print(filename)
+			resources = cachedindex(filename, args.cachedir) if args.cachedir else readindex(filename)
+			for res in resources:
+				if query.matches(res):
+					print(f'{res.decompressed:>12}  {res.name}')
+		return
+
+	if args.output:
+		count = extractall(filenames, args.output, args.jobs, verbose=True, cachedir=args.cachedir, query=query)
+	else:
+		count = 0
+		for filename in filenames:
+			print(filename)
+			count += extractall([filename], os.path.dirname(filename) or os.curdir, args.jobs, verbose=True, cachedir=args.cachedir, query=query)
+	print(f'Extracted {count} files from {len(filenames)} archives')
+
+
+if __name__ == '__main__':
+	sys.exit(main())
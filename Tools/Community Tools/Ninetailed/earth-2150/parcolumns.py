@@ -0,0 +1,9 @@
+#!/usr/bin/env python3
+import sys
+
+from e2150.parcolumns import *
+from e2150.parcolumns import main
+
+
+if __name__ == '__main__':
+    sys.exit(main())
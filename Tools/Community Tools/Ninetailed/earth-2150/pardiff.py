@@ -0,0 +1,9 @@
+#!/usr/bin/env python3
+import sys
+
+from e2150.pardiff import *
+from e2150.pardiff import main
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1 @@
+from e2150.parschema import *
@@ -0,0 +1,9 @@
+#!/usr/bin/env python3
+import sys
+
+from e2150.parsql import *
+from e2150.parsql import main
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,9 @@
+#!/usr/bin/env python3
+import sys
+
+from e2150.png2tex import *
+from e2150.png2tex import main
+
+
+if __name__ == '__main__':
+    sys.exit(main())